@@ -0,0 +1,48 @@
+# Compares the fused filter-and-render pass of DialecticParagraphProcessor with
+# Text.filter followed by str(): checks that the output (or the raised
+# exception) is identical and reports the time per paragraph.
+#
+#   python benchmarks/dialectic_render.py [paragraphs]
+import sys
+import time
+import random
+
+from benchmarks.inputs import random_paragraph, text_paragraph
+from text_generator.paragraph.dialectic import DialecticParagraphProcessor
+
+
+def run(processor: DialecticParagraphProcessor, fused: bool, paragraphs: list[str]):
+    processor.fused_rendering = fused
+    results = []
+    start = time.perf_counter()
+    for paragraph in paragraphs:
+        try:
+            results.append(processor.process(paragraph))
+        except Exception as e:
+            results.append(type(e))
+    return time.perf_counter() - start, results
+
+
+def main():
+    amount = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    r = random.Random(0)
+    processor = DialecticParagraphProcessor()
+
+    inputs = [
+        ("random", [random_paragraph(r, r.randint(0, 40)) for _ in range(50_000)]),
+        ("paragraphs", [text_paragraph(r, r.randint(20, 200)) for _ in range(amount)]),
+    ]
+    for name, paragraphs in inputs:
+        old_time, expected = run(processor, False, paragraphs)
+        new_time, actual = run(processor, True, paragraphs)
+        mismatches = [p for p, a, b in zip(paragraphs, expected, actual) if a != b]
+        for p in mismatches[:5]:
+            print(f"  mismatch: {p!r}")
+        print(
+            f"{name}: {len(paragraphs):,}, mismatches: {len(mismatches)}, "
+            f"{old_time / len(paragraphs) * 1e6:.1f} -> {new_time / len(paragraphs) * 1e6:.1f} us/paragraph"
+        )
+
+
+if __name__ == '__main__':
+    main()
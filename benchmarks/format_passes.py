@@ -0,0 +1,88 @@
+# Compares the regex based TranscriptionFormatter passes with the original
+# character by character implementations on large chunks and checks that the
+# output is identical.
+#
+#   python benchmarks/format_passes.py [chunk size]
+import sys
+import time
+import random
+import unicodedata
+
+from text_generator.formatter import (
+    TranscriptionFormatter, RUSSIAN_ALPHABET, SOFT_VOWELS, PAIRED_CONSONANTS,
+    VOWELS, APOSTROPHE, COMBINING_ACUTE, YOT_TABLE
+)
+
+
+def decompose_acutes(text: str) -> str:
+    result = ""
+    for char in text:
+        decomposed = unicodedata.normalize('NFD', char)
+        if COMBINING_ACUTE in decomposed:
+            result += decomposed
+        else:
+            result += char
+    return result
+
+
+def add_softness(text: str) -> str:
+    result = text[0]
+    for i in range(1, len(text)):
+        previous, current = text[i-1], text[i]
+
+        if current in SOFT_VOWELS and previous in PAIRED_CONSONANTS:
+            result += APOSTROPHE
+        result += current
+
+    return result
+
+
+def add_yots(text: str) -> str:
+    result = text[0]
+    for i in range(1, len(text)):
+        previous, current = text[i-1], text[i]
+
+        if previous in VOWELS and current in SOFT_VOWELS:
+            result += YOT_TABLE[current.lower()]
+        else:
+            result += current
+    return result
+
+
+def random_text(size: int, seed=0) -> str:
+    r = random.Random(seed)
+    alphabet = RUSSIAN_ALPHABET + ' ' * 10 + ',.!?-' + 'áéóÁÉ' + COMBINING_ACUTE
+    return ''.join(r.choice(alphabet) for _ in range(size))
+
+
+def measure(function, text: str) -> tuple[float, str]:
+    start = time.perf_counter()
+    result = function(text)
+    return time.perf_counter() - start, result
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    text = random_text(size)
+
+    # Builds the decomposition table outside of the measurement
+    TranscriptionFormatter._decompose_acutes(" ")
+
+    passes = [
+        ("decompose acutes", decompose_acutes, TranscriptionFormatter._decompose_acutes),
+        ("softness", add_softness, TranscriptionFormatter._add_softness),
+        ("yots", add_yots, TranscriptionFormatter._add_yots),
+    ]
+
+    print(f"{size:,} characters")
+    for name, old, new in passes:
+        old_time, expected = measure(old, text)
+        new_time, actual = measure(new, text)
+        print(
+            f"  {name:18} {old_time * 1000:8.1f} ms -> {new_time * 1000:7.1f} ms"
+            f" ({old_time / new_time:.1f}x), identical: {actual == expected}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+# Random inputs for the dialectic tokenizer and renderer benchmarks, which
+# also serve as their equivalence checks in tests/test_dialectic.py.
+import random
+
+from text_generator.paragraph.dialectic import Alphabet
+
+
+# Any mix of letters, digits, punctuation, combining marks and whitespace
+def random_paragraph(r: random.Random, size: int) -> str:
+    alphabet = "абвгд ЁЖ xyz 12" + Alphabet.punctuation + "́̆\t\n—–" + " " * 6
+    return ''.join(r.choice(alphabet) for _ in range(size))
+
+
+# Sentences of words as they appear in articles, with brackets, quotes,
+# dashes, numbers and foreign words
+def text_paragraph(r: random.Random, words: int) -> str:
+    vocabulary = (
+        "деревня ста̄ну́шку руба́хи пришивали (говорили) «старые» люди в "
+        "Архангельской области, - 1920-х годов; \"так\" и т.д. что-то [1] 50% "
+        "(Latin) «only» ∑ , - — word: (а,б.) «в!» \"x\""
+    ).split()
+    return ' '.join(r.choice(vocabulary) for _ in range(words)) + '.'
@@ -0,0 +1,58 @@
+# Measures the memory and the time spent on token and parse tree allocation of
+# the dialectic processor. All trees of a synthetic article are kept alive at
+# once, so the peak shows the size of the objects. Run it on two revisions
+# to compare them.
+#
+#   python benchmarks/parse_memory.py [paragraphs]
+import sys
+import time
+import random
+import resource
+import tracemalloc
+
+from text_generator.paragraph.dialectic import DialecticParagraphProcessor
+
+
+def article(paragraphs: int, seed=0) -> list[str]:
+    r = random.Random(seed)
+    vocabulary = (
+        "деревня ста̄ну́шку руба́хи пришивали (говорили) «старые» люди в "
+        "Архангельской области, - 1920-х годов; \"так\" и т.д. что-то [1]"
+    ).split()
+    return [' '.join(r.choice(vocabulary) for _ in range(150)) + '.' for _ in range(paragraphs)]
+
+
+def build(processor: DialecticParagraphProcessor, paragraphs: list[str]) -> list:
+    trees = []
+    for paragraph in paragraphs:
+        tokens = processor.tokenizer.tokenise(processor._preprocess(paragraph))
+        trees.append((tokens, processor.parser.parse(tokens)))
+    return trees
+
+
+def main():
+    amount = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    paragraphs = article(amount)
+    processor = DialecticParagraphProcessor()
+
+    start = time.perf_counter()
+    trees = build(processor, paragraphs)
+    elapsed = time.perf_counter() - start
+    tokens = sum(len(t) for t, _ in trees)
+    del trees
+
+    tracemalloc.start()
+    trees = build(processor, paragraphs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del trees
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{amount:,} paragraphs, {tokens:,} tokens")
+    print(f"  allocation: {elapsed * 1000:.1f} ms ({elapsed / tokens * 1e9:.0f} ns/token)")
+    print(f"  traced peak: {peak / 2**20:.1f} MiB ({peak / tokens:.0f} B/token)")
+    print(f"  max RSS: {rss / 1024:.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# Compares the single pass HTML extraction with the BeautifulSoup path of
+# WikipediaFetcher._parse_page. Takes saved parse HTML files as arguments or
+# generates a long synthetic article.
+#
+#   python benchmarks/parse_page.py [page.html ...]
+import sys
+import time
+import random
+
+from text_generator.wiki import WikipediaFetcher
+
+
+def synthetic_article(paragraphs=300, seed=0) -> str:
+    r = random.Random(seed)
+    words = "деревня ста̄ну́шку руба́хи пришивали говорили старые люди в Архангельской области".split()
+
+    html = ['<div class="mw-content-ltr mw-parser-output" lang="ru" dir="ltr">']
+    for i in range(paragraphs):
+        if i % 20 == 0:
+            html.append(f'<div class="mw-heading mw-heading2"><h2 id="s{i}">Раздел {i}</h2></div>')
+        sentence = ' '.join(r.choice(words) for _ in range(60))
+        html.append(
+            f'<p><b>{sentence[:20]}</b> {sentence} <a href="/wiki/X" title="X">ссылка</a>'
+            f'<sup class="reference"><a href="#cite_note-{i}">&#91;{i}&#93;</a></sup>'
+            f'<style data-mw-deduplicate="x">.x{{color:red}}</style>&nbsp;{sentence}.</p>'
+        )
+        if i % 7 == 0:
+            html.append(f'<dl><dd>{sentence}</dd></dl>')
+        if i % 11 == 0:
+            html.append('<table class="wikitable"><tr><td>1</td><td>2</td></tr></table>')
+    html.append('</div>')
+    return ''.join(html)
+
+
+def measure(html: str, fast: bool, repeat: int) -> tuple[float, object]:
+    WikipediaFetcher.fast_parsing = fast
+    start = time.perf_counter()
+    for _ in range(repeat):
+        page = WikipediaFetcher._parse_page(html)
+    return (time.perf_counter() - start) / repeat, page
+
+
+def main():
+    if len(sys.argv) > 1:
+        pages = [(path, open(path, encoding='utf-8').read()) for path in sys.argv[1:]]
+    else:
+        pages = [('synthetic', synthetic_article())]
+
+    for name, html in pages:
+        repeat = 10
+        slow, expected = measure(html, False, repeat)
+        fast, actual = measure(html, True, repeat)
+
+        print(f"{name}: {len(html):,} chars")
+        print(f"  beautifulsoup: {slow * 1000:8.2f} ms/page")
+        print(f"  single pass:   {fast * 1000:8.2f} ms/page ({slow / fast:.1f}x)")
+        print(f"  same result:   {actual == expected}")
+
+
+if __name__ == '__main__':
+    main()
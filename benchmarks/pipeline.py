@@ -0,0 +1,189 @@
+# Per-stage benchmark of the generation pipeline on the saved parse HTML in
+# benchmarks/fixtures (or the given files). Every stage is timed on its own
+# input, prepared by the previous stages, and run again under tracemalloc for
+# the peak memory. The accenting format stage is skipped when the tsnorm
+# Normalizer can not be loaded.
+#
+#   python benchmarks/pipeline.py [--repeat 5] [--json out.json] [--compare old.json] [page.html ...]
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+
+from text_generator.wiki import WikipediaFetcher
+from text_generator.generator import TextGenerator
+from text_generator.formatter import TranscriptionFormatter
+from text_generator.paragraph.dialectic import DialecticParagraphProcessor
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+class Stage:
+    def __init__(self, name: str, function, units: dict[str, int]):
+        self.name = name
+        self.function = function
+        self.units = units
+
+    def run(self, repeat: int) -> dict:
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            self.function()
+            best = min(best, time.perf_counter() - start)
+
+        tracemalloc.start()
+        self.function()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        result = {'seconds': best, 'peak_bytes': peak}
+        for unit, amount in self.units.items():
+            result[f'{unit}_per_s'] = amount / best if best else 0.0
+        return result
+
+
+def load_fixtures(paths: list[str]) -> list[str]:
+    if not paths:
+        paths = sorted(
+            os.path.join(FIXTURES, name) for name in os.listdir(FIXTURES) if name.endswith('.html')
+        )
+    fixtures = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            fixtures.append(f.read())
+    return fixtures
+
+
+def build_stages(fixtures: list[str]) -> tuple[list[Stage], dict[str, str]]:
+    processor = DialecticParagraphProcessor()
+    html_chars = sum(map(len, fixtures))
+
+    pages = [WikipediaFetcher._parse_page(html) for html in fixtures]
+    paragraphs = [p for page in pages for p in page.get_all_paragraphs()]
+    paragraph_chars = sum(map(len, paragraphs))
+
+    preprocessed = [processor._preprocess(p) for p in paragraphs]
+    tokens = [processor.tokenizer.tokenise(p) for p in preprocessed]
+
+    def process(fused: bool):
+        processor.fused_rendering = fused
+        for p in paragraphs:
+            try:
+                processor.process(p)
+            except Exception:
+                pass
+        processor.fused_rendering = DialecticParagraphProcessor.fused_rendering
+
+    def parse_trees():
+        trees = []
+        for t in tokens:
+            try:
+                trees.append(processor.parser.parse(t))
+            except Exception:
+                pass
+        return trees
+
+    texts = []
+    for p in paragraphs:
+        try:
+            texts.append(processor.process(p))
+        except Exception:
+            texts.append(p)
+    text_chars = sum(map(len, texts))
+
+    def parse_fast(fast: bool):
+        WikipediaFetcher.fast_parsing = fast
+        for html in fixtures:
+            WikipediaFetcher._parse_page(html)
+        WikipediaFetcher.fast_parsing = True
+
+    def unaccented_passes():
+        result = []
+        for text in texts:
+            text = TranscriptionFormatter._decompose_acutes(text)
+            text = TranscriptionFormatter._add_softness(text)
+            text = TranscriptionFormatter._add_yots(text)
+            result.append(text)
+        return list(TranscriptionFormatter.iter_formatted_words(result))
+
+    # Sentences are cut from text formatted without accents, so this stage
+    # does not depend on the Normalizer
+    words = [w for w in unaccented_passes() if len(w) < 40]
+    random.seed(0)
+    sentences = len(TextGenerator._split_sentences(words, 2, 4))
+
+    def split():
+        random.seed(0)
+        TextGenerator._split_sentences(words, 2, 4)
+
+    stages = [
+        Stage('parse_html', lambda: parse_fast(True), {'chars': html_chars, 'pages': len(fixtures)}),
+        Stage('parse_html_bs4', lambda: parse_fast(False), {'chars': html_chars, 'pages': len(fixtures)}),
+        Stage('tokenize', lambda: [processor.tokenizer.tokenise(p) for p in preprocessed],
+              {'chars': paragraph_chars, 'paragraphs': len(paragraphs)}),
+        Stage('parse_tree', parse_trees, {'paragraphs': len(paragraphs)}),
+        Stage('process', lambda: process(True), {'chars': paragraph_chars, 'paragraphs': len(paragraphs)}),
+        Stage('process_unfused', lambda: process(False), {'chars': paragraph_chars, 'paragraphs': len(paragraphs)}),
+        Stage('format_passes', unaccented_passes, {'chars': text_chars}),
+        Stage('sentences', split, {'words': len(words), 'sentences': sentences}),
+    ]
+    skipped = {}
+
+    try:
+        formatter = TranscriptionFormatter()
+        formatter.format(texts[0])
+    except Exception as e:
+        skipped['format'] = f"{type(e).__name__}: {e}"
+    else:
+        stages.append(Stage('format', lambda: list(formatter.iter_words(texts)), {'chars': text_chars}))
+        stages.append(Stage('format_many', lambda: formatter.format_many(texts), {'chars': text_chars}))
+
+    return stages, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage pipeline benchmark")
+    parser.add_argument('fixtures', nargs='*', help="saved parse HTML, benchmarks/fixtures by default")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--compare', help="results of a previous run to compare with")
+    args = parser.parse_args()
+
+    stages, skipped = build_stages(load_fixtures(args.fixtures))
+    results = {stage.name: stage.run(args.repeat) for stage in stages}
+
+    previous = {}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)['stages']
+
+    for name, result in results.items():
+        rates = ', '.join(
+            f"{value:,.0f} {key[:-len('_per_s')]}/s" for key, value in result.items() if key.endswith('_per_s')
+        )
+        line = f"{name:16} {result['seconds'] * 1000:9.2f} ms  peak {result['peak_bytes'] / 2**20:7.2f} MiB  {rates}"
+        if name in previous:
+            line += f"  ({previous[name]['seconds'] / result['seconds']:.2f}x)"
+        print(line)
+    for name, reason in skipped.items():
+        print(f"{name:16} skipped ({reason.splitlines()[0][:80]})")
+
+    if args.json:
+        report = {
+            'timestamp': time.time(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'stages': results,
+            'skipped': skipped,
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# Compares the windowed sentence splitter of TextGenerator with the original
+# loop that resliced the word list and filtered every sentence on its own:
+# checks that both cut the same sentences and count the same dropped ones
+# for the same random state, then reports words per second on word lists of
+# growing size.
+#
+#   python benchmarks/sentences.py [max words]
+import sys
+import time
+import random
+
+from text_generator.metrics import Metrics
+from text_generator.generator import TextGenerator
+from text_generator.paragraph.dialectic import Alphabet
+
+LEGACY_LIMIT = 100_000
+
+
+def legacy_split_sentences(words: list[str], min_words, max_words, metrics: Metrics) -> list[str]:
+    sentences_list = []
+
+    while len(words) > max_words:
+        sentence_len = random.randint(min_words, max_words)
+        sentence = " ".join(words[:max_words])
+        words = words[sentence_len:]
+
+        sentence = ''.join(filter(lambda s: s in Alphabet.allowed_symbols, sentence))
+        if not sentence:
+            metrics.increment('sentences_empty')
+            continue
+        if not any(
+            symbol in sentence for symbol in Alphabet.dialectic
+        ):
+            metrics.increment('sentences_without_dialectic')
+            continue
+
+        sentences_list.append(sentence)
+
+    return sentences_list
+
+
+def random_words(r: random.Random, amount: int) -> list[str]:
+    vocabulary = (
+        "д'ер'евн'я ста̄ну́шку руба́х'и пр'ишивал'и говорили «старые» люди в "
+        "Архангельской области, 1920-х годов; \"так\" т.д. [1] 50% x — ́ '"
+    ).split() + [""]
+    return [r.choice(vocabulary) for _ in range(amount)]
+
+
+def run(split, words: list[str], min_words: int, max_words: int) -> tuple[list[str], dict, float]:
+    metrics = Metrics()
+    random.seed(0)
+    start = time.perf_counter()
+    sentences = split(words, min_words, max_words, metrics)
+    return sentences, metrics.snapshot()['counters'], time.perf_counter() - start
+
+
+def check(r: random.Random) -> int:
+    mismatches = 0
+    for _ in range(5_000):
+        words = random_words(r, r.randint(0, 30))
+        min_words = r.randint(1, 4)
+        max_words = r.randint(min_words, 6)
+        old = run(legacy_split_sentences, words, min_words, max_words)[:2]
+        new = run(TextGenerator._split_sentences, words, min_words, max_words)[:2]
+        if old != new:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"  mismatch: {words!r} {min_words}..{max_words}")
+    return mismatches
+
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    r = random.Random(0)
+    print(f"random inputs: 5,000, mismatches: {check(r)}")
+
+    amount = 10_000
+    while amount <= limit:
+        words = random_words(r, amount)
+        new_sentences, _, new_time = run(TextGenerator._split_sentences, words, 2, 4)
+        # The original loop is quadratic, it is only timed on smaller lists
+        if amount > LEGACY_LIMIT:
+            print(f"  {amount:>10,} words: {amount / new_time:,.0f} words/s")
+        else:
+            old_sentences, _, old_time = run(legacy_split_sentences, words, 2, 4)
+            assert old_sentences == new_sentences
+            print(
+                f"  {amount:>10,} words: {amount / old_time:,.0f} -> {amount / new_time:,.0f} words/s"
+                f" ({old_time / new_time:.1f}x)"
+            )
+        amount *= 10
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# Cold start benchmark. Every measurement runs in a fresh interpreter:
+#   import      `import text_generator` and `from text_generator import TextGenerator`
+#   pickle      loading the tsnorm stress dictionary the way Normalizer does
+#   snapshot    opening a StressSnapshot and looking up a sample of words
+#   workers     PSS of forked processes reading the same snapshot
+#
+# The snapshot is built first when it does not exist (about half a minute),
+# by default in the temporary directory so it is reused by later runs.
+#
+#   python benchmarks/startup.py [--snapshot stress.snap] [--workers 4]
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+from text_generator.stress import StressSnapshot
+
+IMPORT = """
+import time
+start = time.perf_counter()
+{statement}
+seconds = time.perf_counter() - start
+"""
+
+PICKLE = """
+import os, time, pickle
+from text_generator.stress import StressSnapshot
+start = time.perf_counter()
+with open(os.path.join(StressSnapshot._dictionary_path(), 'wordforms.dat'), 'rb') as f:
+    word_forms = pickle.load(f)
+seconds = time.perf_counter() - start
+"""
+
+SNAPSHOT = """
+import time
+from text_generator.stress import StressSnapshot
+start = time.perf_counter()
+word_forms = StressSnapshot({path!r})
+seconds = time.perf_counter() - start
+"""
+
+WORKERS = """
+import os, time, random
+from text_generator.stress import StressSnapshot
+from text_generator.memory import memory_usage
+snapshot = StressSnapshot({path!r})
+words = random.Random(0).sample(range(snapshot.count), 20000)
+read, write = os.pipe()
+children = []
+for _ in range({workers}):
+    pid = os.fork()
+    if pid == 0:
+        for i in words:
+            snapshot[snapshot._key(i)]
+        os.write(write, (json.dumps(memory_usage()) + '\\n').encode())
+        time.sleep(1)
+        os._exit(0)
+    children.append(pid)
+with os.fdopen(read) as f:
+    extra = {{'workers': [json.loads(f.readline()) for _ in children]}}
+for pid in children:
+    os.waitpid(pid, 0)
+seconds = 0.0
+"""
+
+REPORT = """
+from text_generator.memory import memory_usage
+print(json.dumps({'seconds': seconds, **memory_usage(), **extra}))
+"""
+
+
+def run(code: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, '-c', 'import json\nextra = {}\n' + code + REPORT],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def mib(value: int) -> str:
+    return f"{value / 2**20:7.1f} MiB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start benchmark")
+    parser.add_argument(
+        '--snapshot', default=os.path.join(tempfile.gettempdir(), 'text_generator_stress.snap'),
+        help="snapshot file, built when missing"
+    )
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    for statement in ("import text_generator", "from text_generator import TextGenerator"):
+        result = run(IMPORT.format(statement=statement))
+        print(f"{statement:42} {result['seconds'] * 1000:9.1f} ms  rss {mib(result['rss'])}")
+
+    if not os.path.exists(args.snapshot):
+        print(f"building {args.snapshot}")
+        StressSnapshot.build(args.snapshot)
+
+    for name, code in (('pickle', PICKLE), ('snapshot', SNAPSHOT.format(path=args.snapshot))):
+        result = run(code)
+        print(f"{name + ' load':42} {result['seconds'] * 1000:9.1f} ms  rss {mib(result['rss'])}")
+
+    result = run(WORKERS.format(path=args.snapshot, workers=args.workers))
+    for i, worker in enumerate(result['workers']):
+        print(f"{f'worker {i}':42} rss {mib(worker['rss'])}  pss {mib(worker['pss'])}")
+
+
+if __name__ == '__main__':
+    main()
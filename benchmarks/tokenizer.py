@@ -0,0 +1,115 @@
+# Compares the regex based dialectic Tokenizer with the original character by
+# character scanner: checks that both produce the same token stream on random
+# and paragraph-like inputs and reports the throughput in tokens per second.
+#
+#   python benchmarks/tokenizer.py [paragraphs]
+import sys
+import time
+import random
+
+from benchmarks.inputs import random_paragraph, text_paragraph
+from text_generator.paragraph.dialectic import Alphabet, Token, TokenType, Tokenizer
+
+
+class LegacyTokenizer:
+    def __init__(self):
+        self.position: int = 0
+        self.paragraph: str = None
+
+    def peek(self):
+        return self.paragraph[self.position]
+
+    def peek_next(self):
+        if (next_pos := self.position + 1) >= len(self.paragraph):
+            return ""
+        return self.paragraph[next_pos]
+
+    def tokenise(self, paragraph):
+        self.position = 0
+        self.paragraph = paragraph
+        tokens = []
+
+        while self.position < len(self.paragraph):
+            char = self.peek()
+            token = None
+
+            match char:
+                case "(" | "[":
+                    token = Token(TokenType.OPEN_PARENT, self.position, char)
+                case ")" | "]":
+                    token = Token(TokenType.CLOSE_PARENT, self.position, char)
+                case "\"" | "'":
+                    token = Token(TokenType.QUOTE, self.position, char)
+                case "«":
+                    token = Token(TokenType.OPEN_QUOTE, self.position, char)
+                case "»":
+                    token = Token(TokenType.CLOSE_QUOTE, self.position, char)
+                case "." | "!" | "?":
+                    token = Token(TokenType.ENDING_PUNCTUATION, self.position, char)
+                case "," | ";" | ":" | "/" | "-":
+                    token = Token(TokenType.PUNCTUATION, self.position, char)
+                case " ":
+                    pass
+                case _:
+                    word = char
+                    start = self.position
+                    while (
+                        (symbol := self.peek_next()) not in Alphabet.punctuation
+                        and symbol not in Alphabet.separators
+                        or symbol == '-'
+                    ):
+                        word += symbol
+                        self.position += 1
+                    token = Token(TokenType.WORD, start, word)
+
+            self.position += 1
+            if token:
+                tokens.append(token)
+
+        tokens.append(Token(TokenType.EOF, self.position, None))
+        return tokens
+
+
+def stream(tokens: list[Token]) -> list[tuple]:
+    return [(t.type, t.position, t.literal) for t in tokens]
+
+
+def check(paragraphs: list[str]) -> int:
+    legacy, tokenizer = LegacyTokenizer(), Tokenizer()
+    mismatches = 0
+    for paragraph in paragraphs:
+        if stream(legacy.tokenise(paragraph)) != stream(tokenizer.tokenise(paragraph)):
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"  mismatch: {paragraph!r}")
+    return mismatches
+
+
+def measure(tokenizer, paragraphs: list[str]) -> tuple[float, int]:
+    count = 0
+    start = time.perf_counter()
+    for paragraph in paragraphs:
+        count += len(tokenizer.tokenise(paragraph))
+    return time.perf_counter() - start, count
+
+
+def main():
+    amount = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    r = random.Random(0)
+
+    random_inputs = [random_paragraph(r, r.randint(0, 40)) for _ in range(50_000)]
+    print(f"random inputs: {len(random_inputs):,}, mismatches: {check(random_inputs)}")
+
+    paragraphs = [text_paragraph(r, r.randint(20, 200)) for _ in range(amount)]
+    print(f"paragraphs: {len(paragraphs):,}, mismatches: {check(paragraphs)}")
+
+    old_time, count = measure(LegacyTokenizer(), paragraphs)
+    new_time, _ = measure(Tokenizer(), paragraphs)
+    print(
+        f"  {count:,} tokens: {count / old_time:,.0f} -> {count / new_time:,.0f} tokens/s"
+        f" ({old_time / new_time:.1f}x)"
+    )
+
+
+if __name__ == '__main__':
+    main()
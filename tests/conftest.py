@@ -0,0 +1,14 @@
+import os
+
+import pytest
+
+from text_generator.wiki import WikipediaFetcher
+
+FIXTURES = os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'fixtures')
+
+
+@pytest.fixture(scope='session')
+def article_paragraphs() -> list[str]:
+    with open(os.path.join(FIXTURES, 'dialect_article.html'), encoding='utf-8') as f:
+        page = WikipediaFetcher._parse_page(f.read())
+    return page.get_all_paragraphs()
@@ -0,0 +1,94 @@
+import pytest
+
+from text_generator.accent import AccentCache, CachedAccentor
+from text_generator.formatter import TranscriptionFormatter
+from text_generator.generator import TextGenerator
+
+TEXTS = [
+    "Все замки́ на дверях были старые. Он пошёл в за́мок!",
+    "ЁЛКА стоит во дворе, а ёж — под ней. Кто-то сказал по-русски: «Ну и ну».",
+    "Северо-западные говоры; т.д. 1920-х годов.\nНовая строка, Архангельская область?",
+]
+
+
+@pytest.fixture(scope='module')
+def normalizer():
+    try:
+        return TranscriptionFormatter._load_accentor()
+    except Exception as e:
+        # tsnorm downloads its spaCy model on import
+        pytest.skip(f"tsnorm is not available: {e}")
+
+
+def test_cached_accentor_matches_normalizer(normalizer, article_paragraphs):
+    accentor = CachedAccentor(normalizer, AccentCache())
+    texts = [TranscriptionFormatter._decompose_acutes(text) for text in article_paragraphs + TEXTS]
+
+    expected = [normalizer(text) for text in texts]
+    assert [accentor(text) for text in texts] == expected
+    # Second pass is answered from the cache
+    assert [accentor(text) for text in texts] == expected
+    assert accentor.cache.hits > 0
+
+
+# Stands in for tsnorm's Normalizer: accents words from a small dictionary,
+# the homograph "замок" by the word after it
+class DictionaryNormalizer:
+    word_pattern = CachedAccentor.word_pattern
+
+    def __init__(self):
+        self._word_forms = {
+            'дом': [{'form': 'до́м'}],
+            'вода': [{'form': 'вода́'}, {'form': 'вода́'}],
+            'кто-то': [{'form': 'кто́-то'}],
+            'замок': [{'form': 'за́мок'}, {'form': 'замо́к'}],
+        }
+        self.calls = []
+
+    def derive_single_accentuation(self, interpretations):
+        forms = {interpretation['form'] for interpretation in interpretations}
+        return forms.pop() if len(forms) == 1 else None
+
+    def __call__(self, text: str) -> str:
+        self.calls.append(text)
+
+        def accent(match):
+            word = match.group()
+            forms = self._word_forms.get(word.lower())
+            if forms is None:
+                return word
+            form = forms[0]['form']
+            if len(forms) > 1 and not text[match.end():].lstrip().startswith('на'):
+                form = forms[1]['form']
+            return form.capitalize() if word[0].isupper() else form
+
+        return self.word_pattern.sub(accent, text)
+
+
+CONTEXT_TEXTS = [
+    "Дом у воды. Вода в доме! Кто-то пришёл",
+    "Замок на горе стоит. Старый дом, замок висит.\nВода и дом",
+    "Северо-западный дом? Кто-то-там.",
+]
+
+
+def test_cached_accentor_matches_normalizer_steps():
+    expected = [DictionaryNormalizer()(text) for text in CONTEXT_TEXTS]
+
+    normalizer = DictionaryNormalizer()
+    accentor = CachedAccentor(normalizer, AccentCache())
+    assert [accentor(text) for text in CONTEXT_TEXTS] == expected
+    # Only the two sentences with the homograph go through as a whole
+    assert accentor.fallbacks == 2
+
+    normalizer.calls.clear()
+    assert [accentor(text) for text in CONTEXT_TEXTS] == expected
+    assert normalizer.calls == ["Замок на горе стоит.\nСтарый дом, замок висит."]
+
+
+def test_generator_passes_the_accent_cache(tmp_path):
+    cache = AccentCache(max_size=1000, path=str(tmp_path / 'accents.json'))
+    g = TextGenerator(fetcher=object(), accent_cache=cache, format_workers=2)
+    assert g.formatter.accent_cache is cache
+    assert (g.formatter_pool.accent_cache_size, g.formatter_pool.accent_cache_path) == (1000, cache.path)
+    g.close()
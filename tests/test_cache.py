@@ -0,0 +1,41 @@
+import gzip
+import json
+
+from text_generator import cache as cache_module
+from text_generator.cache import PageCache
+from text_generator.fetcher import Page
+
+
+def page(title: str) -> Page:
+    page = Page(title, revision=7)
+    page.section.paragraphs.append(f"{title} text")
+    return page
+
+
+def test_pages_expire_after_max_age(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, 'time', lambda: now[0])
+
+    cache = PageCache(str(tmp_path), max_age=60)
+    cache.put(page("A"))
+    now[0] += 30
+    assert cache.get("A") == page("A")
+
+    now[0] += 31
+    assert PageCache(str(tmp_path), offline=True, max_age=60).get("A") == page("A")
+    assert cache.get("A") is None
+    assert "A" not in cache
+    assert not list(tmp_path.iterdir())
+
+
+def test_pages_without_a_stored_time_are_expired(tmp_path):
+    cache = PageCache(str(tmp_path))
+    cache.put(page("A"))
+
+    # Files written before the time was stored
+    path = next(tmp_path.iterdir())
+    data = json.loads(gzip.decompress(path.read_bytes()))
+    path.write_bytes(gzip.compress(json.dumps(data[:3]).encode('utf-8')))
+
+    assert PageCache(str(tmp_path)).get("A") == page("A")
+    assert PageCache(str(tmp_path), max_age=3600).get("A") is None
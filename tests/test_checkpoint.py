@@ -0,0 +1,52 @@
+import pytest
+
+from text_generator import checkpoint as checkpoint_module
+from text_generator.checkpoint import Checkpoint
+from text_generator.dedup import FingerprintStore, BloomFilterStore
+
+
+@pytest.mark.parametrize('store', [FingerprintStore, lambda: BloomFilterStore(capacity=1000)])
+def test_restore_dedup_store(tmp_path, store):
+    checkpoint = Checkpoint(str(tmp_path))
+    for i in range(10):
+        checkpoint.add_sentence(f"sentence {i}")
+    checkpoint.flush()
+
+    dedup = store()
+    Checkpoint(str(tmp_path)).restore(dedup)
+    assert all(not dedup.add(f"sentence {i}") for i in range(10))
+    assert dedup.add("sentence 10")
+
+
+def test_flush_appends_fingerprints(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path))
+    for i in range(3):
+        checkpoint.add_sentence(f"sentence {i}")
+        checkpoint.flush()
+    assert (tmp_path / 'dedup.bin').stat().st_size == 3 * 8
+
+
+def test_crash_before_state_is_replaced(tmp_path, monkeypatch):
+    checkpoint = Checkpoint(str(tmp_path))
+    checkpoint.add_title("page 1")
+    checkpoint.add_sentence("kept")
+    checkpoint.flush()
+
+    # Files are appended but state.json is never replaced
+    def crash(*args):
+        raise OSError("crash")
+    monkeypatch.setattr(checkpoint_module.os, 'replace', crash)
+    checkpoint.add_title("page 2")
+    checkpoint.add_sentence("lost")
+    with pytest.raises(OSError):
+        checkpoint.flush()
+    monkeypatch.undo()
+
+    resumed = Checkpoint(str(tmp_path))
+    assert list(resumed.sentences()) == ["kept"]
+    assert resumed.titles == {"page 1"}
+
+    dedup = FingerprintStore()
+    resumed.restore(dedup)
+    assert "kept" in dedup
+    assert "lost" not in dedup
@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from benchmarks import dialectic_render
+from benchmarks.inputs import random_paragraph, text_paragraph
+from benchmarks.tokenizer import LegacyTokenizer, stream
+from text_generator.paragraph.dialectic import DialecticParagraphProcessor, Tokenizer
+
+EDGE_CASES = [
+    "",
+    " ",
+    "-",
+    "слово",
+    "что-то - так",
+    "а-",
+    "-а",
+    "(говорили) «старые» [1] \"так\" 'и' т.д.!?",
+    "ста̄ну́шку\tруба́хи\nпришивали",
+    "50% x—y, a/b; c:d",
+]
+
+
+@pytest.mark.parametrize('paragraph', EDGE_CASES)
+def test_tokenizer_matches_legacy_on_edge_cases(paragraph):
+    assert stream(Tokenizer().tokenise(paragraph)) == stream(LegacyTokenizer().tokenise(paragraph))
+
+
+def test_tokenizer_matches_legacy_on_article(article_paragraphs):
+    legacy, tokenizer = LegacyTokenizer(), Tokenizer()
+    for paragraph in article_paragraphs:
+        assert stream(tokenizer.tokenise(paragraph)) == stream(legacy.tokenise(paragraph))
+
+
+def test_tokenizer_matches_legacy_on_random_inputs():
+    r = random.Random(0)
+    legacy, tokenizer = LegacyTokenizer(), Tokenizer()
+    paragraphs = [random_paragraph(r, r.randint(0, 40)) for _ in range(5_000)]
+    paragraphs += [text_paragraph(r, r.randint(1, 50)) for _ in range(500)]
+    for paragraph in paragraphs:
+        assert stream(tokenizer.tokenise(paragraph)) == stream(legacy.tokenise(paragraph)), paragraph
+
+
+def render(paragraphs: list[str]) -> list:
+    processor = DialecticParagraphProcessor()
+    return [
+        dialectic_render.run(processor, fused, paragraphs)[1]
+        for fused in (False, True)
+    ]
+
+
+def test_fused_rendering_matches_filter_and_str(article_paragraphs):
+    r = random.Random(0)
+    paragraphs = list(article_paragraphs) + EDGE_CASES
+    paragraphs += [random_paragraph(r, r.randint(0, 40)) for _ in range(5_000)]
+    paragraphs += [text_paragraph(r, r.randint(1, 50)) for _ in range(500)]
+
+    expected, actual = render(paragraphs)
+    assert any(isinstance(result, str) and result for result in actual)
+    for paragraph, old, new in zip(paragraphs, expected, actual):
+        assert new == old, paragraph
@@ -0,0 +1,131 @@
+import bz2
+import json
+import random
+
+import pytest
+
+from text_generator.dump import DumpFetcher
+from text_generator.fetcher import PagesExhausted
+from text_generator.formatter import TranscriptionFormatter
+from text_generator.generator import TextGenerator
+
+WORDS = "старые люди говорили ста́ну́шку и руба́хи пришивали в деревне у самого моря".split()
+
+PAGE = """  <page>
+    <title>{title}</title>
+    <ns>{ns}</ns>
+    <id>{i}</id>
+    <revision>
+      <id>{revision}</id>
+      <text xml:space="preserve">{text}</text>
+    </revision>
+  </page>
+"""
+
+
+def text(seed) -> str:
+    r = random.Random(seed)
+    return ' '.join(r.choice(WORDS) for _ in range(60)) + '.'
+
+
+def xml_dump(path, pages):
+    xml = ''.join(
+        PAGE.format(i=i, title=title, ns=ns, revision=100 + i, text=text(i))
+        for i, (title, ns) in enumerate(pages)
+    )
+    data = f'<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/">\n{xml}</mediawiki>\n'.encode()
+    if path.suffix == '.bz2':
+        data = bz2.compress(data)
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.mark.parametrize('name', ['dump.xml', 'dump.xml.bz2'])
+def test_get_article_from_xml_index(tmp_path, name):
+    fetcher = DumpFetcher(xml_dump(tmp_path / name, [("Первая", 0), ("R&amp;B", 0), ("Обсуждение", 1), ("Последняя", 0)]))
+
+    assert fetcher.get_article("Последняя").revision == 103
+    assert fetcher.get_article("R&B").revision == 101
+    assert len(fetcher.index) == 4
+    with pytest.raises(LookupError):
+        fetcher.get_article("Обсуждение")
+    with pytest.raises(LookupError):
+        fetcher.get_article("Нет такой")
+
+
+def test_get_article_from_ndjson_index(tmp_path):
+    path = tmp_path / 'dump.ndjson'
+    path.write_text(''.join(
+        json.dumps({'name': title, 'version': {'identifier': i}, 'article_body': {'html': f'<p>{text(i)}</p>'}}) + '\n'
+        for i, title in enumerate(["Первая", "Вторая"])
+    ), encoding='utf-8')
+
+    fetcher = DumpFetcher(str(path))
+    assert fetcher.get_article("Вторая").revision == 1
+    with pytest.raises(LookupError):
+        fetcher.get_article("Третья")
+
+
+def test_ndjson_index_decodes_only_the_name(tmp_path, monkeypatch):
+    path = tmp_path / 'dump.ndjson'
+    path.write_text(''.join(
+        json.dumps(article, ensure_ascii=False) + '\n' for article in [
+            {'name': "Первая \"цитата\"", 'version': {'identifier': 1}, 'article_body': {'html': f'<p>{text(1)}</p>'}},
+            {'version': {'identifier': 2}, 'name': "Вторая", 'article_body': {'html': f'<p>{text(2)}</p>'}},
+        ]
+    ), encoding='utf-8')
+
+    loads = []
+    monkeypatch.setattr(json, 'loads', lambda s, loads_=json.loads: loads.append(s) or loads_(s))
+    index = DumpFetcher(str(path))._build_index()
+
+    assert list(index) == ["Первая \"цитата\"", "Вторая"]
+    # The first record starts with its name, only the second one is parsed whole
+    assert [len(s) < 40 for s in loads] == [True, False]
+
+
+def test_get_article_from_multistream_dump(tmp_path, monkeypatch):
+    pages = [(f"Статья {i}", 0) for i in range(5)] + [("R&amp;B", 0)]
+    xml_dump(tmp_path / 'dump.xml', pages)
+    data = (tmp_path / 'dump.xml').read_bytes()
+
+    # Every two pages go into their own stream, like the hundred pages of real dumps
+    chunks = data.split(b'  <page>')
+    streams, index = [bz2.compress(chunks[0])], []
+    offset = len(streams[0])
+    for i in range(1, len(chunks), 2):
+        group = b''.join(b'  <page>' + chunk for chunk in chunks[i:i + 2])
+        for title, _ in pages[i - 1:i + 1]:
+            index.append(f"{offset}:{i}:{title}\n")
+        streams.append(bz2.compress(group))
+        offset += len(streams[-1])
+    (tmp_path / 'dump.xml.bz2').write_bytes(b''.join(streams))
+    (tmp_path / 'index.txt.bz2').write_bytes(bz2.compress(''.join(index).encode()))
+
+    fetcher = DumpFetcher(str(tmp_path / 'dump.xml.bz2'), multistream_index=str(tmp_path / 'index.txt.bz2'))
+    assert [page.title for page in fetcher.iter_pages()] == ["Статья 0", "Статья 1", "Статья 2", "Статья 3", "Статья 4", "R&B"]
+
+    # Lookups don't decompress the dump from the start
+    monkeypatch.setattr(DumpFetcher, '_open', None)
+    assert fetcher.get_article("Статья 3").revision == 103
+    assert fetcher.get_article("R&B").revision == 105
+    with pytest.raises(LookupError):
+        fetcher.get_article("Нет такой")
+
+
+def test_random_articles_run_out(tmp_path):
+    fetcher = DumpFetcher(xml_dump(tmp_path / 'dump.xml', [("Первая", 0), ("Вторая", 0)]))
+    assert [fetcher.get_random_article().title for _ in range(2)] == ["Первая", "Вторая"]
+    with pytest.raises(PagesExhausted):
+        fetcher.get_random_article()
+
+
+@pytest.mark.parametrize('seed', [None, 1])
+def test_generator_stops_at_the_end_of_the_dump(tmp_path, monkeypatch, seed):
+    monkeypatch.setattr(TranscriptionFormatter, '_accentor', lambda text: text)
+    path = xml_dump(tmp_path / 'dump.xml', [(f"Статья {i}", 0) for i in range(5)])
+
+    g = TextGenerator(fetcher=DumpFetcher(path), fetch_workers=3, process_workers=2, seed=seed)
+    chunks = list(g.iter_text_chunks(10_000, metadata=True))
+    assert 0 < len(chunks) < 10_000
+    assert {metadata['title'] for _, metadata in chunks} == {f"Статья {i}" for i in range(5)}
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from text_generator.extract import ContentExtractor
+from text_generator.fetcher import Section
+from text_generator.wiki import WikipediaFetcher
+
+FIXTURES = os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'fixtures')
+HEADINGS = os.path.join(os.path.dirname(__file__), 'fixtures', 'headings_article.html')
+PAGES = [os.path.join(FIXTURES, name) for name in sorted(os.listdir(FIXTURES))] + [HEADINGS]
+
+CHARREFS = (
+    '<div class="mw-parser-output"><p>'
+    '&#65;&#x41;&#X42; &#128;&#150;&#x9f; &#0; &#1;&#x7f;&#xfffe; &#xd800; &#1114112; &#99999999999; '
+    '&#1087;&#x440;&#1080; &amp;&nbsp;&unknown; &#65x &#x41g'
+    '</p><dl><dd>&#769;&#x306;</dd></dl></div>'
+)
+
+
+# ContentExtractor is used without the BeautifulSoup fallback of _parse_page
+@pytest.mark.parametrize('name', sorted(os.listdir(FIXTURES)))
+def test_extractor_matches_beautifulsoup_on_fixtures(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        html = f.read()
+    assert ContentExtractor().extract(html) == WikipediaFetcher._extract_content(html)
+
+
+def test_extractor_matches_beautifulsoup_on_character_references():
+    content = ContentExtractor().extract(CHARREFS)
+    assert content == WikipediaFetcher._extract_content(CHARREFS)
+    assert content[0][1].startswith("AAB €–Ÿ � \x01\x7f￾ � � � при &\xa0&unknown Ax Ag")
+
+
+def read(path) -> str:
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def outline(section: Section) -> tuple:
+    return section.title, section.level, [outline(s) for s in section.subsections]
+
+
+@pytest.mark.parametrize('path', PAGES, ids=os.path.basename)
+def test_section_trees_match_beautifulsoup(path, monkeypatch):
+    html = read(path)
+    monkeypatch.setattr(WikipediaFetcher, 'fast_parsing', True)
+    fast = WikipediaFetcher._parse_page(html)
+    monkeypatch.setattr(WikipediaFetcher, 'fast_parsing', False)
+    slow = WikipediaFetcher._parse_page(html)
+
+    assert fast == slow
+    assert fast.section.subsections
+
+
+def test_heading_divs_build_the_section_tree():
+    page = WikipediaFetcher._parse_page(read(HEADINGS))
+
+    assert outline(page.section) == ('Main', 1, [
+        ('История', 2, [
+            ('Промыслы', 3, [('Ветра', 4, [])]),
+            ('Исследования', 3, []),
+        ]),
+        ('Фонетика', 2, [('Ударение', 3, [])]),
+    ])
+    assert not any('Примечания' in p for p in page.get_all_paragraphs())
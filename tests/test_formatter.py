@@ -0,0 +1,96 @@
+import random
+
+import pytest
+
+from benchmarks.format_passes import add_softness, add_yots, decompose_acutes, random_text
+from text_generator.formatter import TranscriptionFormatter
+from text_generator.paragraph.dialectic import DialecticParagraphProcessor
+
+WORDS = "Старые люди говорили ста́ну́шку и руба́хи ЕЛИ яблоки в деревне у самого моря".split()
+
+
+def random_paragraphs(r: random.Random, count: int) -> list[str]:
+    paragraphs = []
+    for _ in range(count):
+        words = [r.choice(WORDS) + r.choice(['', '', '', ',', '.', '!', '?!', '...']) for _ in range(r.randint(0, 12))]
+        paragraphs.append(r.choice(['', ' ', '\n']) + ' '.join(words) + r.choice(['', ' ', '\n', '. ']))
+    return paragraphs
+
+
+@pytest.fixture
+def formatter(monkeypatch):
+    monkeypatch.setattr(TranscriptionFormatter, '_accentor', lambda text: text)
+    return TranscriptionFormatter()
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_passes_match_character_scans(seed):
+    text = random_text(20_000, seed)
+    assert TranscriptionFormatter._decompose_acutes(text) == decompose_acutes(text)
+    assert TranscriptionFormatter._add_softness(text) == add_softness(text)
+    assert TranscriptionFormatter._add_yots(text) == add_yots(text)
+
+
+@pytest.mark.parametrize('add_pauses', [True, False])
+def test_iter_words_matches_format_of_joined_paragraphs(formatter, add_pauses):
+    r = random.Random(0)
+    for _ in range(500):
+        paragraphs = random_paragraphs(r, r.randint(0, 8))
+        expected = formatter.format(' '.join(paragraphs), add_pauses=add_pauses).split()
+        assert list(formatter.iter_words(paragraphs, add_pauses=add_pauses)) == expected, paragraphs
+
+
+def test_iter_words_on_article(formatter, article_paragraphs):
+    assert list(formatter.iter_words(article_paragraphs)) == formatter.format(' '.join(article_paragraphs)).split()
+
+
+@pytest.mark.parametrize('batch_chars', [500_000, 200])
+def test_format_many_isolates_failed_texts(monkeypatch, batch_chars):
+    calls = []
+
+    def accentor(text):
+        calls.append(text)
+        if 'ошибка' in text:
+            raise ValueError(text)
+        # Batches with this text come back with fewer lines
+        if 'склейка' in text:
+            return text.replace('\n', ' ')
+        return text
+
+    monkeypatch.setattr(TranscriptionFormatter, '_accentor', accentor)
+    monkeypatch.setattr(TranscriptionFormatter, 'accent_batch_chars', batch_chars)
+    formatter = TranscriptionFormatter()
+
+    r = random.Random(1)
+    texts = [' '.join(random_paragraphs(r, 2)) for _ in range(40)]
+    texts[3] = "тут ошибка"
+    texts[17] = "первая строка.\nвторая строка"
+    texts[25] = "склейка строк"
+    texts[30] += " ошибка"
+
+    results = formatter.format_many(texts)
+    assert len(results) == len(texts)
+    for i, (text, result) in enumerate(zip(texts, results)):
+        if i in (3, 30):
+            assert isinstance(result, ValueError)
+        else:
+            assert result == formatter.format(text)
+    # The text with its own newline is accented alone
+    assert "первая строка.\nвторая строка" in calls
+
+
+def test_process_many_isolates_failed_paragraphs(monkeypatch):
+    processor = DialecticParagraphProcessor()
+    paragraphs = ["Старые люди говорили так.", "сбой", "", "Руба́хи пришивали в деревне."]
+    expected = [processor.process(p) for p in paragraphs if p != "сбой"]
+
+    process = processor.process
+    def failing(paragraph):
+        if paragraph == "сбой":
+            raise ValueError(paragraph)
+        return process(paragraph)
+    monkeypatch.setattr(processor, 'process', failing)
+
+    results = processor.process_many(paragraphs)
+    assert isinstance(results[1], ValueError)
+    assert [results[0], results[2], results[3]] == expected
@@ -0,0 +1,207 @@
+import time
+import random
+import asyncio
+import itertools
+import functools
+import threading
+
+import pytest
+
+from benchmarks.sentences import legacy_split_sentences, random_words, run
+from text_generator.checkpoint import Checkpoint
+from text_generator.dedup import FingerprintStore
+from text_generator.fetcher import BaseFetcher, Page
+from text_generator.formatter import TranscriptionFormatter
+from text_generator.generator import ResultOrder, TextGenerator
+
+
+class StaticFetcher(BaseFetcher):
+    def get_article(self, title) -> Page:
+        return Page(title)
+
+    def get_random_article(self) -> Page:
+        return Page("page")
+
+
+def test_generate_returns_at_most_amount_from_checkpoint(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path))
+    for i in range(10):
+        checkpoint.add_sentence(f"sentence {i}")
+    checkpoint.flush()
+
+    g = TextGenerator(fetcher=StaticFetcher(), checkpoint=Checkpoint(str(tmp_path)))
+    assert g.generate_text_chunks(4) == [f"sentence {i}" for i in range(4)]
+
+
+def test_title_is_used_only_when_all_sentences_are_taken(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path))
+    g = TextGenerator(fetcher=StaticFetcher(), checkpoint=checkpoint)
+    seen = FingerprintStore()
+
+    assert g._accept("cut", ["a", "b", "c"], seen, limit=2) == ["a", "b"]
+    assert "cut" not in checkpoint.titles
+
+    # A resumed run fetches the page again and takes the rest of it
+    assert g._accept("cut", ["a", "b", "c"], seen, limit=None) == ["c"]
+    assert "cut" in checkpoint.titles
+    assert g._accept("cut", ["a", "b", "c"], seen, limit=None) == []
+
+
+@pytest.mark.parametrize('split_batch', [TextGenerator.split_batch, 7])
+def test_split_sentences_matches_legacy(monkeypatch, split_batch):
+    # Small batches put many windows across batch boundaries
+    monkeypatch.setattr(TextGenerator, 'split_batch', split_batch)
+    r = random.Random(0)
+    for _ in range(2_000):
+        words = random_words(r, r.randint(0, 60))
+        min_words = r.randint(1, 4)
+        max_words = r.randint(min_words, 6)
+        expected = run(legacy_split_sentences, words, min_words, max_words)[:2]
+        assert run(TextGenerator._split_sentences, words, min_words, max_words)[:2] == expected, words
+
+
+class SlowFetcher(BaseFetcher):
+    words = "ста́ну́шку деревня руба́хи пришивали говорили старые люди в области".split()
+
+    def __init__(self):
+        self.count = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def get_article(self, title) -> Page:
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        # Later pages are fetched sooner
+        time.sleep(0.05 / (int(title.split()[-1]) % 4 + 1))
+        with self.lock:
+            self.active -= 1
+
+        r = random.Random(title)
+        page = Page(title)
+        page.section.paragraphs.extend(
+            ' '.join(r.choice(self.words) for _ in range(40)) + '.' for _ in range(3)
+        )
+        return page
+
+    def get_random_article(self) -> Page:
+        return self.draw_random_article()()
+
+    def draw_random_article(self):
+        with self.lock:
+            self.count += 1
+            title = f"Article {self.count}"
+        return functools.partial(self.get_article, title)
+
+
+def test_seeded_pages_keep_their_order_and_are_fetched_concurrently(monkeypatch):
+    monkeypatch.setattr(TranscriptionFormatter, '_accentor', lambda text: text)
+
+    def generate(fetch_workers):
+        fetcher = SlowFetcher()
+        g = TextGenerator(fetcher=fetcher, fetch_workers=fetch_workers, process_workers=2, seed=1)
+        titles = [metadata['title'] for _, metadata in g.iter_text_chunks(150, metadata=True)]
+        return titles, fetcher.max_active
+
+    expected, _ = generate(1)
+    titles, max_active = generate(4)
+    assert titles == expected
+    assert list(dict.fromkeys(titles)) == [f"Article {i}" for i in range(1, len(set(titles)) + 1)]
+    assert max_active > 1
+
+
+class StallingFetcher(SlowFetcher):
+    def get_article(self, title) -> Page:
+        if title == "Article 2":
+            time.sleep(1)
+        return super().get_article(title)
+
+
+def test_results_waiting_for_a_stalled_page_are_bounded(monkeypatch):
+    monkeypatch.setattr(TranscriptionFormatter, '_accentor', lambda text: text)
+    pending = []
+    push = ResultOrder.push
+
+    def record(order, index, result):
+        push(order, index, result)
+        pending.append(len(order.pending))
+    monkeypatch.setattr(ResultOrder, 'push', record)
+
+    fetcher = StallingFetcher()
+    g = TextGenerator(fetcher=fetcher, fetch_workers=4, process_workers=2, queue_size=4, seed=1)
+    titles = [metadata['title'] for _, metadata in g.iter_text_chunks(300, metadata=True)]
+
+    assert list(dict.fromkeys(titles))[:3] == ["Article 1", "Article 2", "Article 3"]
+    assert max(pending) <= 2 * 4 + 4 + 2
+
+
+def record_workers(monkeypatch) -> list[threading.Thread]:
+    workers = []
+    start = TextGenerator._start_workers
+
+    def recording(self, *args):
+        started = start(self, *args)
+        workers.extend(started[2])
+        return started
+    monkeypatch.setattr(TextGenerator, '_start_workers', recording)
+    return workers
+
+
+@pytest.mark.parametrize('seed', [None, 1])
+def test_iter_text_chunks_returns_amount_and_joins_the_workers(monkeypatch, seed):
+    monkeypatch.setattr(TranscriptionFormatter, '_accentor', lambda text: text)
+    workers = record_workers(monkeypatch)
+
+    g = TextGenerator(fetcher=SlowFetcher(), fetch_workers=3, process_workers=2, seed=seed)
+    assert len(list(g.iter_text_chunks(37))) == 37
+    assert len(workers) == 5 and not any(worker.is_alive() for worker in workers)
+
+
+@pytest.mark.parametrize('seed', [None, 1])
+def test_closing_iter_text_chunks_early_joins_the_workers(monkeypatch, seed):
+    monkeypatch.setattr(TranscriptionFormatter, '_accentor', lambda text: text)
+    workers = record_workers(monkeypatch)
+
+    fetcher = SlowFetcher()
+    g = TextGenerator(fetcher=fetcher, fetch_workers=3, process_workers=2, seed=seed)
+    chunks = g.iter_text_chunks(10_000)
+    assert len(list(itertools.islice(chunks, 5))) == 5
+    chunks.close()
+
+    assert len(workers) == 5 and not any(worker.is_alive() for worker in workers)
+    fetched = fetcher.count
+    time.sleep(0.2)
+    assert fetcher.count == fetched
+
+
+@pytest.mark.parametrize('seed', [None, 1])
+def test_cancelling_aiter_text_chunks_joins_the_workers(monkeypatch, seed):
+    monkeypatch.setattr(TranscriptionFormatter, '_accentor', lambda text: text)
+    workers = record_workers(monkeypatch)
+
+    fetcher = SlowFetcher()
+    g = TextGenerator(fetcher=fetcher, fetch_workers=3, process_workers=2, seed=seed)
+    received = []
+
+    async def consume():
+        async for sentence in g.aiter_text_chunks(10_000):
+            received.append(sentence)
+
+    async def main():
+        # All sentences of a small amount are returned
+        assert len([sentence async for sentence in g.aiter_text_chunks(23)]) == 23
+
+        task = asyncio.create_task(consume())
+        while len(received) < 5:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert 5 <= len(received) < 10_000
+    assert len(workers) == 10 and not any(worker.is_alive() for worker in workers)
+    fetched = fetcher.count
+    time.sleep(0.2)
+    assert fetcher.count == fetched
@@ -0,0 +1,97 @@
+import json
+
+from text_generator.dump import DumpFetcher
+from text_generator.fetcher import BaseFetcher
+from text_generator.formatter import TranscriptionFormatter
+from text_generator.generator import TextGenerator
+from text_generator.merge import merge
+from text_generator.sink import JsonlSink, TextShardSink
+
+from test_dump import xml_dump
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_merge_drops_duplicates_across_inputs(tmp_path):
+    (tmp_path / 'shard0.jsonl').write_text(
+        '{"text": "первая фраза", "title": "А"}\n{"text": "общая фраза", "title": "А"}\n',
+        encoding='utf-8'
+    )
+    (tmp_path / 'shard1.jsonl').write_text(
+        '{"text": "общая фраза", "title": "Б"}\n\n{"text": "вторая фраза"}\n', encoding='utf-8'
+    )
+    texts = tmp_path / 'texts'
+    texts.mkdir()
+    (texts / 'shard-00000.txt').write_text("вторая фраза\nтретья фраза\n", encoding='utf-8')
+
+    output = tmp_path / 'merged.jsonl'
+    with JsonlSink(str(output)) as sink:
+        written, duplicates = merge(
+            [str(tmp_path / 'shard0.jsonl'), str(tmp_path / 'shard1.jsonl'), str(texts)], sink
+        )
+
+    assert (written, duplicates) == (4, 2)
+    assert read_jsonl(output) == [
+        {'text': "первая фраза", 'title': "А"},
+        {'text': "общая фраза", 'title': "А"},
+        {'text': "вторая фраза"},
+        {'text': "третья фраза"},
+    ]
+
+
+def test_merge_into_text_shards(tmp_path):
+    (tmp_path / 'shard0.jsonl').write_text(
+        ''.join(json.dumps({'text': f"фраза номер {i}"}, ensure_ascii=False) + '\n' for i in range(10)),
+        encoding='utf-8'
+    )
+
+    with TextShardSink(str(tmp_path / 'merged'), max_bytes=100) as sink:
+        assert merge([str(tmp_path / 'shard0.jsonl')] * 2, sink) == (10, 10)
+
+    shards = sorted((tmp_path / 'merged').iterdir())
+    assert len(shards) > 1
+    lines = ''.join(shard.read_text(encoding='utf-8') for shard in shards).splitlines()
+    assert lines == [f"фраза номер {i}" for i in range(10)]
+
+
+# Sharded runs over one source work on disjoint titles, cover all of them
+# together and merge without losing sentences
+def test_shards_are_disjoint_and_merge_back(tmp_path, monkeypatch):
+    monkeypatch.setattr(TranscriptionFormatter, '_accentor', lambda text: text)
+    titles = {f"Статья {i}" for i in range(30)}
+    path = xml_dump(tmp_path / 'dump.xml', [(title, 0) for title in sorted(titles)])
+
+    parsed = []
+    to_page = DumpFetcher._to_page
+    monkeypatch.setattr(DumpFetcher, '_to_page', lambda self, title, *args: parsed.append(title) or to_page(self, title, *args))
+
+    shard_count = 3
+    shard_titles, outputs = [], []
+    for shard_index in range(shard_count):
+        output = str(tmp_path / f'shard{shard_index}.jsonl')
+        g = TextGenerator(
+            fetcher=DumpFetcher(path), shard_index=shard_index, shard_count=shard_count,
+            fetch_workers=2, process_workers=2
+        )
+        parsed.clear()
+        with JsonlSink(output) as sink:
+            g.write_text_chunks(sink)
+
+        # Other shards' pages are dropped before they are parsed
+        assert {BaseFetcher.title_shard(title, shard_count) for title in parsed} == {shard_index}
+        shard_titles.append({record['title'] for record in read_jsonl(output)})
+        outputs.append(output)
+
+    assert all(shard_titles)
+    for i in range(shard_count):
+        for j in range(i + 1, shard_count):
+            assert not shard_titles[i] & shard_titles[j]
+    assert set().union(*shard_titles) == titles
+
+    with JsonlSink(str(tmp_path / 'merged.jsonl')) as sink:
+        written, _ = merge(outputs, sink)
+    assert written == len(read_jsonl(tmp_path / 'merged.jsonl'))
+    assert {record['title'] for record in read_jsonl(tmp_path / 'merged.jsonl')} == titles
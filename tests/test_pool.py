@@ -0,0 +1,10 @@
+import multiprocessing
+
+from text_generator.pool import FormatterPool
+
+
+def test_workers_are_not_forked_by_default():
+    method = FormatterPool(workers=1).context.get_start_method()
+    assert method in ('forkserver', 'spawn')
+    assert method in multiprocessing.get_all_start_methods()
+    assert FormatterPool(workers=1, start_method='spawn').context.get_start_method() == 'spawn'
@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+from text_generator.sink import ParquetSink
+
+
+def test_parquet_sink_rotates_files(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    with ParquetSink(str(tmp_path), rows_per_file=3, batch_size=2) as sink:
+        for i in range(8):
+            sink.write(f"sentence {i}", {'title': f"page {i // 4}"})
+
+    paths = [sink.shard_path(i) for i in range(3)]
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(p) for p in paths]
+
+    tables = [pq.read_table(p) for p in paths]
+    assert [t.num_rows for t in tables] == [3, 3, 2]
+    assert [s for t in tables for s in t.column('text').to_pylist()] == [f"sentence {i}" for i in range(8)]
+    assert tables[2].column('title').to_pylist() == ["page 1", "page 1"]
@@ -0,0 +1,129 @@
+import json
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import requests
+
+from text_generator.wiki import AsyncWikipediaFetcher, WikipediaFetcher
+
+TITLES = [["A&B/C? 100%", "Пробел в названии", "T3"], ["T4", "T5", "T6"], ["T7", "T8", "T9"]]
+
+
+# Stand-in for the MediaWiki API: random titles are served in the batches of
+# TITLES, pages contain their title as the server received it
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        query = {k: v[0] for k, v in parse_qs(urlsplit(self.path).query).items()}
+        server = self.server
+        server.requests.append(query)
+
+        if query.get('list') == 'random':
+            batch = server.batches.pop(0)[:int(query['rnlimit'])]
+            result = {'query': {'random': [{'title': title} for title in batch]}}
+        elif query.get('action') == 'parse':
+            title = query['page']
+            html = f'<div class="mw-parser-output"><p>Статья «{title}» из заглушки.</p></div>'
+            result = {'parse': {'title': title, 'revid': 42, 'text': {'*': html}}}
+        else:
+            self.send_error(400)
+            return
+
+        body = json.dumps(result).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    server.requests = []
+    server.batches = [list(batch) for batch in TITLES]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}/w/api.php"
+    server.shutdown()
+    server.server_close()
+
+
+def random_requests(server) -> list[dict]:
+    return [query for query in server.requests if query.get('list') == 'random']
+
+
+def test_fetcher_against_stand_in_server(api_url):
+    server, url = api_url
+    fetcher = WikipediaFetcher(request_wait=0, api_url=url, title_batch=3, title_refill=0)
+
+    page = fetcher.get_article("A&B/C? 100%")
+    assert page.title == "A&B/C? 100%" and page.revision == 42
+    assert page.get_all_paragraphs() == ["Статья «A&B/C? 100%» из заглушки."]
+
+    # The first title was fetched above and is not handed out again
+    assert fetcher.get_random_article().title == "Пробел в названии"
+    assert fetcher.get_random_text() == "Статья «T3» из заглушки."
+    fetcher.skip_titles(["T4"])
+    assert fetcher.get_random_article().title == "T5"
+
+    assert [query['rnlimit'] for query in random_requests(server)] == ['3', '3']
+    fetcher.close()
+
+
+def test_async_fetcher_against_stand_in_server(api_url):
+    server, url = api_url
+
+    async def run():
+        async with AsyncWikipediaFetcher(request_wait=0, api_url=url, title_batch=3, title_refill=0) as fetcher:
+            page = await fetcher.get_article("A&B/C? 100%")
+            assert page.title == "A&B/C? 100%" and page.revision == 42
+            assert page.get_all_paragraphs() == ["Статья «A&B/C? 100%» из заглушки."]
+
+            assert (await fetcher.get_random_article()).title == "Пробел в названии"
+            assert await fetcher.get_random_text() == "Статья «T3» из заглушки."
+            fetcher.skip_titles(["T4"])
+            assert (await fetcher.get_random_article()).title == "T5"
+
+    asyncio.run(run())
+    assert [query['rnlimit'] for query in random_requests(server)] == ['3', '3']
+
+
+class StatusSession:
+    def __init__(self, status: int):
+        self.status = status
+
+    def post(self, url):
+        response = requests.Response()
+        response.status_code = self.status
+        response.url = url
+        return response
+
+
+def test_send_request_raises_on_http_errors():
+    fetcher = WikipediaFetcher(request_wait=0)
+    fetcher._local.session = StatusSession(503)
+    with pytest.raises(requests.HTTPError):
+        fetcher._send_request(fetcher._title_url())
+
+    fetcher._local.session = StatusSession(200)
+    assert fetcher._send_request(fetcher._title_url()).status_code == 200
+
+
+def test_every_thread_has_its_own_session():
+    fetcher = WikipediaFetcher(request_wait=0)
+    sessions = []
+    threads = [threading.Thread(target=lambda: sessions.append(fetcher._session())) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(session) for session in sessions}) == 3
+    assert fetcher._session() is fetcher._session()
+    fetcher.close()
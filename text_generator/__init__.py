@@ -1,9 +1,59 @@
-from .wiki import WikipediaFetcher
-from .formatter import TranscriptionFormatter
-from .generator import TextGenerator
-
-__all__ = [
-    "WikipediaFetcher",
-    "TranscriptionFormatter",
-    "TextGenerator"
-]
\ No newline at end of file
+import importlib
+from typing import TYPE_CHECKING
+
+# Submodules are imported on first access, so `import text_generator` does
+# not pull in requests, BeautifulSoup or tqdm
+_exports = {
+    "BaseFetcher": "fetcher",
+    "Page": "fetcher",
+    "PagesExhausted": "fetcher",
+    "Section": "fetcher",
+    "WikipediaFetcher": "wiki",
+    "AsyncWikipediaFetcher": "wiki",
+    "DumpFetcher": "dump",
+    "PageCache": "cache",
+    "AccentCache": "accent",
+    "StressSnapshot": "stress",
+    "TranscriptionFormatter": "formatter",
+    "FormatterPool": "pool",
+    "BaseDedupStore": "dedup",
+    "FingerprintStore": "dedup",
+    "BloomFilterStore": "dedup",
+    "Checkpoint": "checkpoint",
+    "BaseSink": "sink",
+    "JsonlSink": "sink",
+    "TextShardSink": "sink",
+    "ParquetSink": "sink",
+    "Metrics": "metrics",
+    "TextGenerator": "generator",
+}
+
+if TYPE_CHECKING:
+    from .fetcher import BaseFetcher, Page, PagesExhausted, Section
+    from .wiki import WikipediaFetcher, AsyncWikipediaFetcher
+    from .dump import DumpFetcher
+    from .cache import PageCache
+    from .accent import AccentCache
+    from .stress import StressSnapshot
+    from .formatter import TranscriptionFormatter
+    from .pool import FormatterPool
+    from .dedup import BaseDedupStore, FingerprintStore, BloomFilterStore
+    from .checkpoint import Checkpoint
+    from .sink import BaseSink, JsonlSink, TextShardSink, ParquetSink
+    from .metrics import Metrics
+    from .generator import TextGenerator
+
+
+def __getattr__(name: str):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_exports[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *_exports])
+
+
+__all__ = list(_exports)
@@ -0,0 +1,180 @@
+import os
+import re
+import json
+import threading
+import collections
+
+
+# Word-level cache of accentuation results. Stressed forms that depend on the
+# context (homographs) are stored as None, so the dictionary is not asked about
+# them again.
+class AccentCache:
+    def __init__(self, max_size: int=500_000, path: str=None):
+        self.max_size = max_size
+        self.path = path
+
+        self.entries: collections.OrderedDict[str, str | None] = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits: int = 0
+        self.misses: int = 0
+
+        if self.path is not None and os.path.exists(self.path):
+            self.load(self.path)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, word: str):
+        return word in self.entries
+
+    def get(self, word: str, default=None):
+        with self.lock:
+            if word in self.entries:
+                self.entries.move_to_end(word)
+                self.hits += 1
+                return self.entries[word]
+
+            self.misses += 1
+            return default
+
+    def put(self, word: str, accented: str | None):
+        with self.lock:
+            self.entries[word] = accented
+            self.entries.move_to_end(word)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def save(self, path: str=None):
+        path = path or self.path
+        with self.lock:
+            items = list(self.entries.items())
+
+        temp = f"{path}.tmp"
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(items, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp, path)
+
+    def load(self, path: str):
+        with open(path, encoding='utf-8') as f:
+            items = json.load(f)
+
+        with self.lock:
+            for word, accented in items[-self.max_size:]:
+                self.entries[word] = accented
+                self.entries.move_to_end(word)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+# Accentuates text word by word from the cache. New words of a text are
+# accented together by the normalizer, each on its own line, so they go
+# through the same steps as in a sentence. Only the sentences that contain a
+# word whose stress depends on the context (a homograph in the tsnorm
+# dictionary) are sent through the normalizer as a whole.
+class CachedAccentor:
+    # Combining marks are part of the words, the paragraphs are in NFD
+    word_pattern = re.compile(r'[\w\u0300-\u036f]+(?:-[\w\u0300-\u036f]+)*')
+    sentence_separator = re.compile(r'(?<=[.!?])(\s+)')
+
+    _missing = object()
+
+    def __init__(self, normalizer, cache: AccentCache, lock: threading.Lock=None):
+        self.normalizer = normalizer
+        self.cache = cache
+        self.lock = lock or threading.Lock()
+
+        self.fallbacks: int = 0
+
+    def __call__(self, text: str) -> str:
+        parts = self.sentence_separator.split(text)
+        accents = self._accent_tokens(text)
+
+        ambiguous = []
+        for i in range(0, len(parts), 2):
+            accented = self._accent_sentence(parts[i], accents)
+            if accented is None:
+                ambiguous.append(i)
+            else:
+                parts[i] = accented
+
+        if ambiguous:
+            self.fallbacks += len(ambiguous)
+            for i, accented in zip(ambiguous, self._normalize([parts[i] for i in ambiguous])):
+                parts[i] = accented
+
+        return ''.join(parts)
+
+    def stats(self) -> dict:
+        return {**self.cache.stats(), 'fallbacks': self.fallbacks}
+
+    def _accent_sentence(self, sentence: str, accents: dict[str, str | None]) -> str | None:
+        result = []
+        position = 0
+        for match in self.word_pattern.finditer(sentence):
+            accented = accents[match.group()]
+            if accented is None:
+                return None
+
+            result.append(sentence[position:match.start()])
+            result.append(accented)
+            position = match.end()
+
+        result.append(sentence[position:])
+        return ''.join(result)
+
+    # Accented form of every word of the text, None for homographs
+    def _accent_tokens(self, text: str) -> dict[str, str | None]:
+        accents = {}
+        new = []
+        for token in dict.fromkeys(match.group() for match in self.word_pattern.finditer(text)):
+            accented = self.cache.get(token, self._missing)
+            if accented is self._missing:
+                new.append(token)
+            else:
+                accents[token] = accented
+
+        unambiguous = [token for token in new if not self._ambiguous(token)]
+        accented = dict(zip(unambiguous, self._normalize(unambiguous))) if unambiguous else {}
+        for token in new:
+            accents[token] = accented.get(token)
+            self.cache.put(token, accents[token])
+        return accents
+
+    def _ambiguous(self, token: str) -> bool:
+        # Hyphenated words that are not in the dictionary are split by spaCy
+        words = [token]
+        if '-' in token and self._interpretations(token) is None:
+            words = token.split('-')
+
+        for word in words:
+            interpretations = self._interpretations(word)
+            if interpretations is not None and self.normalizer.derive_single_accentuation(interpretations) is None:
+                return True
+        return False
+
+    def _interpretations(self, word: str):
+        word_forms = self.normalizer._word_forms
+        interpretations = word_forms.get(word)
+        if word.lower() in word_forms:
+            interpretations = word_forms[word.lower()]
+        return interpretations
+
+    def _normalize(self, sentences: list[str]) -> list[str]:
+        # One normalizer call for all sentences, newlines survive tokenization
+        with self.lock:
+            if not any('\n' in s for s in sentences):
+                result = self.normalizer('\n'.join(sentences)).split('\n')
+                if len(result) == len(sentences):
+                    return result
+            return [self.normalizer(s) for s in sentences]
@@ -0,0 +1,170 @@
+import os
+import gzip
+import json
+import time
+import random
+import hashlib
+import threading
+import collections
+
+from .fetcher import Page, PagesExhausted, Section
+
+
+# Pages are stored already parsed, as gzipped JSON named by a hash of the
+# title and the revision:
+#   <sha1(title)>.<revision>.json.gz
+# Files are evicted in least recently used order once the total size is over
+# `max_size`, file modification time keeps the order between runs. With
+# `max_age` (in seconds) pages stored earlier than that are fetched again,
+# except in offline mode.
+class PageCache:
+    suffix = '.json.gz'
+
+    def __init__(self, path: str, max_size: int=1024 ** 3, offline: bool=False, max_age: float=None):
+        self.path = path
+        self.max_size = max_size
+        self.offline = offline
+        self.max_age = max_age
+
+        self.entries: collections.OrderedDict[str, tuple[str, int]] = collections.OrderedDict()
+        self.size: int = 0
+        self.served: set[str] = set()
+        self.lock = threading.Lock()
+
+        os.makedirs(self.path, exist_ok=True)
+        self._scan()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, title: str):
+        return self.key(title) in self.entries
+
+    def get(self, title: str) -> Page | None:
+        key = self.key(title)
+        with self.lock:
+            if key not in self.entries:
+                return None
+            filename, _ = self.entries[key]
+            self.entries.move_to_end(key)
+            self.served.add(key)
+
+        try:
+            page, stored = self._load(filename)
+        except (OSError, ValueError):
+            self._remove(key)
+            return None
+
+        if not self.offline and self.max_age is not None and time.time() - stored > self.max_age:
+            self._remove(key)
+            return None
+        return page
+
+    def get_random(self) -> Page:
+        with self.lock:
+            keys = [key for key in self.entries if key not in self.served]
+        random.shuffle(keys)
+
+        for key in keys:
+            with self.lock:
+                if key not in self.entries:
+                    continue
+                filename, _ = self.entries[key]
+                self.entries.move_to_end(key)
+                self.served.add(key)
+
+            try:
+                return self._load(filename)[0]
+            except (OSError, ValueError):
+                self._remove(key)
+        raise PagesExhausted("There are no more cached pages")
+
+    def put(self, page: Page):
+        key = self.key(page.title)
+        filename = f"{key}.{page.revision}{self.suffix}"
+        data = gzip.compress(json.dumps(
+            [*self._dump_page(page), time.time()], ensure_ascii=False, separators=(',', ':')
+        ).encode('utf-8'))
+
+        temp = os.path.join(self.path, f".{filename}.{threading.get_ident()}")
+        with open(temp, 'wb') as f:
+            f.write(data)
+        os.replace(temp, os.path.join(self.path, filename))
+
+        with self.lock:
+            if key in self.entries:
+                previous, size = self.entries.pop(key)
+                self.size -= size
+                if previous != filename:
+                    self._unlink(previous)
+
+            self.entries[key] = (filename, len(data))
+            self.size += len(data)
+            self.served.add(key)
+
+            while self.size > self.max_size and len(self.entries) > 1:
+                _, (evicted, size) = self.entries.popitem(last=False)
+                self.size -= size
+                self._unlink(evicted)
+
+    @staticmethod
+    def key(title: str) -> str:
+        return hashlib.sha1(title.encode('utf-8')).hexdigest()
+
+    def _scan(self):
+        files = []
+        for entry in os.scandir(self.path):
+            if not entry.is_file() or not entry.name.endswith(self.suffix):
+                continue
+            stat = entry.stat()
+            files.append((stat.st_mtime, entry.name, stat.st_size))
+
+        for _, filename, size in sorted(files):
+            key = filename.split('.', 1)[0]
+            if key in self.entries:
+                self.size -= self.entries[key][1]
+                self._unlink(self.entries.pop(key)[0])
+            self.entries[key] = (filename, size)
+            self.size += size
+
+    # Returns the page and the time it was stored
+    def _load(self, filename: str) -> tuple[Page, float]:
+        filepath = os.path.join(self.path, filename)
+        with open(filepath, 'rb') as f:
+            data = json.loads(gzip.decompress(f.read()))
+        os.utime(filepath)
+        return self._load_page(data[:3]), data[3] if len(data) > 3 else 0.0
+
+    def _remove(self, key: str):
+        with self.lock:
+            if key in self.entries:
+                filename, size = self.entries.pop(key)
+                self.size -= size
+                self._unlink(filename)
+
+    def _unlink(self, filename: str):
+        try:
+            os.remove(os.path.join(self.path, filename))
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def _dump_page(cls, page: Page) -> list:
+        return [page.title, page.revision, cls._dump_section(page.section)]
+
+    @classmethod
+    def _dump_section(cls, section: Section) -> list:
+        return [
+            section.title, section.level, section.paragraphs,
+            [cls._dump_section(s) for s in section.subsections]
+        ]
+
+    @classmethod
+    def _load_page(cls, data: list) -> Page:
+        title, revision, section = data
+        return Page(title, cls._load_section(section), revision)
+
+    @classmethod
+    def _load_section(cls, data: list) -> Section:
+        title, level, paragraphs, subsections = data
+        return Section(title, level, paragraphs, [cls._load_section(s) for s in subsections])
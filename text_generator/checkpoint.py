@@ -0,0 +1,131 @@
+import os
+import json
+import array
+import random
+
+from .dedup import BaseDedupStore, fingerprint
+
+
+# Progress of a generation run kept in a directory:
+#   sentences.txt  generated sentences, one per line, append-only
+#   titles.txt     titles of the pages already used, append-only
+#   dedup.bin      64-bit fingerprints of the sentences, append-only
+#   state.json     sizes of the files at the last flush and the RNG state
+# A flush appends to the files and then replaces state.json, anything appended
+# after the last complete flush is cut off on load, so the files always match
+# the saved state. The dedup store of a run is restored from the fingerprints.
+class Checkpoint:
+    def __init__(self, path: str, flush_every: int=1000):
+        self.path = path
+        self.flush_every = flush_every
+
+        self.sentences_path = os.path.join(path, 'sentences.txt')
+        self.titles_path = os.path.join(path, 'titles.txt')
+        self.dedup_path = os.path.join(path, 'dedup.bin')
+        self.state_path = os.path.join(path, 'state.json')
+
+        self.count: int = 0
+        self.titles: set[str] = set()
+        self.random_state = None
+
+        self.pending_sentences: list[str] = []
+        self.pending_titles: list[str] = []
+
+        os.makedirs(self.path, exist_ok=True)
+        self._load()
+
+    def __len__(self):
+        return self.count + len(self.pending_sentences)
+
+    def add_sentence(self, sentence: str) -> bool:
+        self.pending_sentences.append(sentence)
+        return len(self.pending_sentences) >= self.flush_every
+
+    def add_title(self, title: str):
+        if title not in self.titles:
+            self.titles.add(title)
+            self.pending_titles.append(title)
+
+    def sentences(self):
+        if not os.path.exists(self.sentences_path):
+            return
+        with open(self.sentences_path, encoding='utf-8') as f:
+            for line in f:
+                yield line.rstrip('\n')
+
+    def flush(self):
+        fingerprints = array.array('Q', map(fingerprint, self.pending_sentences))
+        dedup_size = self._append_bytes(self.dedup_path, fingerprints.tobytes())
+        sentences_size = self._append(self.sentences_path, self.pending_sentences)
+        titles_size = self._append(self.titles_path, self.pending_titles)
+
+        self.count += len(self.pending_sentences)
+        self.pending_sentences.clear()
+        self.pending_titles.clear()
+
+        state = {
+            'sentences': self.count,
+            'sentences_size': sentences_size,
+            'titles_size': titles_size,
+            'dedup_size': dedup_size,
+            'random': random.getstate(),
+        }
+        temp = f"{self.state_path}.tmp"
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temp, self.state_path)
+
+    def restore(self, dedup: BaseDedupStore=None):
+        if dedup is not None and os.path.exists(self.dedup_path):
+            fingerprints = array.array('Q')
+            with open(self.dedup_path, 'rb') as f:
+                fingerprints.frombytes(f.read())
+            for value in fingerprints:
+                dedup.add_fingerprint(value)
+        if self.random_state is not None:
+            version, internal, gauss = self.random_state
+            random.setstate((version, tuple(internal), gauss))
+
+    def _load(self):
+        if not os.path.exists(self.state_path):
+            # Nothing was flushed, leftovers of a crashed first flush are dropped
+            for path in (self.sentences_path, self.titles_path, self.dedup_path):
+                self._truncate(path, 0)
+            return
+
+        with open(self.state_path, encoding='utf-8') as f:
+            state = json.load(f)
+
+        self.count = state['sentences']
+        self.random_state = state['random']
+        self._truncate(self.sentences_path, state['sentences_size'])
+        self._truncate(self.titles_path, state['titles_size'])
+        self._truncate(self.dedup_path, state['dedup_size'])
+
+        if os.path.exists(self.titles_path):
+            with open(self.titles_path, encoding='utf-8') as f:
+                self.titles.update(line.rstrip('\n') for line in f)
+
+    @staticmethod
+    def _append(path: str, lines: list[str]) -> int:
+        with open(path, 'a', encoding='utf-8') as f:
+            for line in lines:
+                f.write(line)
+                f.write('\n')
+            f.flush()
+            os.fsync(f.fileno())
+            return f.tell()
+
+    @staticmethod
+    def _append_bytes(path: str, data: bytes) -> int:
+        with open(path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            return f.tell()
+
+    @staticmethod
+    def _truncate(path: str, size: int):
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            with open(path, 'r+b') as f:
+                f.truncate(size)
@@ -0,0 +1,137 @@
+import os
+import abc
+import math
+import array
+import struct
+import hashlib
+
+
+def fingerprint(sentence: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(sentence.encode('utf-8'), digest_size=8).digest(), 'little'
+    )
+
+
+class BaseDedupStore(abc.ABC):
+    # Remembers the sentence, returns False if it was already seen
+    def add(self, sentence: str) -> bool:
+        return self.add_fingerprint(fingerprint(sentence))
+
+    # Same as add for a sentence with this fingerprint, used to restore a
+    # store from the fingerprints kept by a Checkpoint
+    @abc.abstractmethod
+    def add_fingerprint(self, value: int) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def __contains__(self, sentence: str) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    @abc.abstractmethod
+    def save(self, path: str=None):
+        pass
+
+    @abc.abstractmethod
+    def load(self, path: str):
+        pass
+
+    @staticmethod
+    def _replace(path: str, data: bytes):
+        temp = f"{path}.tmp"
+        with open(temp, 'wb') as f:
+            f.write(data)
+        os.replace(temp, path)
+
+
+# Exact dedup by 64-bit fingerprints, 8 bytes per sentence on disk and about
+# 60 in memory instead of the whole string. A collision (a new sentence taken
+# for a duplicate) is expected once in about 2^32 sentences.
+class FingerprintStore(BaseDedupStore):
+    def __init__(self, path: str=None):
+        self.path = path
+        self.fingerprints: set[int] = set()
+
+        if self.path is not None and os.path.exists(self.path):
+            self.load(self.path)
+
+    def add_fingerprint(self, value: int) -> bool:
+        if value in self.fingerprints:
+            return False
+        self.fingerprints.add(value)
+        return True
+
+    def __contains__(self, sentence: str) -> bool:
+        return fingerprint(sentence) in self.fingerprints
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def save(self, path: str=None):
+        self._replace(path or self.path, array.array('Q', self.fingerprints).tobytes())
+
+    def load(self, path: str):
+        values = array.array('Q')
+        with open(path, 'rb') as f:
+            values.frombytes(f.read())
+        self.fingerprints.update(values)
+
+
+# Approximate dedup with a fixed amount of memory: about 1.2 bytes per
+# sentence for a 1% false positive rate. A false positive drops a new
+# sentence, a duplicate always gets detected.
+class BloomFilterStore(BaseDedupStore):
+    header = struct.Struct('<QQQ')
+
+    def __init__(self, capacity: int=10_000_000, error_rate: float=0.001, path: str=None):
+        self.path = path
+        self.capacity = capacity
+        self.error_rate = error_rate
+
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count: int = 0
+
+        if self.path is not None and os.path.exists(self.path):
+            self.load(self.path)
+
+    def add_fingerprint(self, value: int) -> bool:
+        new = False
+        bits = self.bits
+        for position in self._positions(value):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                new = True
+
+        if new:
+            self.count += 1
+        return new
+
+    def __contains__(self, sentence: str) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(fingerprint(sentence)))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def save(self, path: str=None):
+        self._replace(path or self.path, self.header.pack(self.size, self.hashes, self.count) + self.bits)
+
+    def load(self, path: str):
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.size, self.hashes, self.count = self.header.unpack_from(data)
+        self.bits = bytearray(data[self.header.size:])
+
+    def _positions(self, value: int):
+        # Double hashing, k positions from two 64-bit halves of one digest of
+        # the sentence fingerprint
+        digest = hashlib.blake2b(value.to_bytes(8, 'little'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
@@ -0,0 +1,367 @@
+import re
+import bz2
+import gzip
+import io
+import html
+import json
+import random
+import tarfile
+import functools
+import threading
+import xml.etree.ElementTree as ET
+from typing import Callable, Iterator
+
+from .fetcher import BaseFetcher, Page, PagesExhausted, Section
+from .wiki import WikipediaFetcher
+
+
+class WikitextConverter:
+    heading = re.compile(r'^(={2,6})\s*(.*?)\s*\1\s*$')
+
+    # Innermost constructs first, repeated until nothing changes
+    template = re.compile(r'\{\{[^{}]*\}\}')
+    table = re.compile(r'\{\|(?:(?!\{\|).)*?\|\}', re.DOTALL)
+    internal_link = re.compile(r'\[\[([^\[\]|]*)(?:\|([^\[\]]*))?\]\]')
+
+    comment = re.compile(r'<!--.*?-->', re.DOTALL)
+    reference = re.compile(r'<ref[^>/]*(?:/>|>.*?</ref\s*>)', re.DOTALL | re.IGNORECASE)
+    tag_block = re.compile(r'<(gallery|math|score|syntaxhighlight|timeline|imagemap)[^>]*>.*?</\1\s*>', re.DOTALL | re.IGNORECASE)
+    tag = re.compile(r'<[^>]+>')
+    external_link = re.compile(r'\[(?:https?:)?//[^\s\]]+\s*([^\]]*)\]')
+    emphasis = re.compile(r"'{2,5}")
+
+    skipped_links = ('файл:', 'file:', 'изображение:', 'image:', 'категория:', 'category:')
+    skipped_lines = ('|', '!', '*', '#', ';', '__', '[[')
+
+    def convert(self, wikitext: str) -> list[Section]:
+        text = self._strip(wikitext)
+
+        sections = [Section('Main', 1)]
+        for line in text.split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+
+            if match := self.heading.match(line):
+                level, title = match.groups()
+                sections.append(Section(title, len(level)))
+                continue
+
+            if line.startswith(':'):
+                # Indented lines are <dd> in the rendered page
+                line = line.lstrip(':').strip()
+            elif line.startswith(self.skipped_lines):
+                continue
+
+            if line:
+                sections[-1].paragraphs.append(line)
+
+        return sections
+
+    def _strip(self, text: str) -> str:
+        text = self.comment.sub('', text)
+        text = self.reference.sub('', text)
+        text = self.tag_block.sub('', text)
+
+        text = self._repeat(self.template, '', text)
+        text = self._repeat(self.table, '', text)
+        text = self._repeat(self.internal_link, self._replace_link, text)
+
+        text = self.external_link.sub(r'\1', text)
+        text = self.tag.sub('', text)
+        text = self.emphasis.sub('', text)
+
+        return html.unescape(text)
+
+    def _replace_link(self, match: re.Match) -> str:
+        target, label = match.groups()
+        if target.strip().lower().startswith(self.skipped_links):
+            return ''
+        return label if label is not None else target
+
+    @staticmethod
+    def _repeat(pattern: re.Pattern, replacement, text: str) -> str:
+        count = 1
+        while count:
+            text, count = pattern.subn(replacement, text)
+        return text
+
+
+# Streams articles from a local dump instead of the live API. Supported sources:
+#  - MediaWiki XML dumps (pages-articles.xml, .xml.bz2, .xml.gz) with wikitext
+#  - Wikimedia Enterprise HTML dumps (.tar.gz archives or .ndjson files)
+# Pages are read one at a time, so memory stays constant regardless of the
+# dump size. `offset` skips the first pages, `shard_index`/`shard_count` keep
+# every shard_count-th page and `sample_rate` keeps a random part of them.
+# Pages of other title shards (see keep_shard) are dropped before parsing.
+# get_article looks titles up in an index of record offsets, built with one
+# pass over the dump on the first call (archives are scanned every time).
+# Compressed dumps can't seek, so every lookup decompresses them up to the
+# page, unless a multistream .bz2 dump comes with its `multistream_index`.
+class DumpFetcher(BaseFetcher):
+    def __init__(
+        self, path: str, sample_rate: float=1, offset: int=0,
+        shard_index: int=0, shard_count: int=1, seed: int=None,
+        multistream_index: str=None
+    ):
+        self.path = path
+        # Index of a multistream dump (pages-articles-multistream-index.txt.bz2),
+        # with it get_article only decompresses the stream of the page
+        self.multistream_index = multistream_index
+        self.sample_rate = sample_rate
+        self.offset = offset
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        # (shard_index, shard_count) of the titles to keep, see keep_shard
+        self.title_shard_of: tuple[int, int] = None
+
+        self.random = random.Random(seed)
+        self.converter = WikitextConverter()
+
+        self.records: Iterator[tuple[str, int, str, bool]] = None
+        self.lock = threading.Lock()
+
+        self.index: dict[str, int] = None
+        self.index_lock = threading.Lock()
+
+    def get_article(self, title) -> Page:
+        if self._format() == 'archive':
+            records = self._read_records()
+        elif (offset := self._get_index().get(title)) is not None:
+            records = self._read_record_at(offset)
+        else:
+            records = ()
+
+        for record in records:
+            if record[0] == title:
+                return self._to_page(*record)
+        raise LookupError(f"Page {title} is not in the dump")
+
+    def get_random_article(self) -> Page:
+        return self.draw_random_article()()
+
+    # The dump is read under the lock, the selected pages are parsed by the
+    # returned functions
+    def draw_random_article(self) -> Callable[[], Page]:
+        with self.lock:
+            if self.records is None:
+                self.records = self._select_records()
+
+            try:
+                record = next(self.records)
+            except StopIteration:
+                raise PagesExhausted(f"There are no more pages in {self.path}")
+        return functools.partial(self._to_page, *record)
+
+    def keep_shard(self, shard_index: int, shard_count: int):
+        self.title_shard_of = (shard_index, shard_count)
+
+    def iter_pages(self) -> Iterator[Page]:
+        for record in self._select_records():
+            yield self._to_page(*record)
+
+    # Records are cheap, only the selected ones are parsed
+    def _select_records(self) -> Iterator[tuple[str, int, str, bool]]:
+        for i, record in enumerate(self._read_records()):
+            if i < self.offset:
+                continue
+            if (i - self.offset) % self.shard_count != self.shard_index:
+                continue
+            if not self._owns(record[0]):
+                continue
+            if self.sample_rate < 1 and self.random.random() >= self.sample_rate:
+                continue
+            yield record
+
+    def _owns(self, title: str) -> bool:
+        if self.title_shard_of is None:
+            return True
+        shard_index, shard_count = self.title_shard_of
+        return self.title_shard(title, shard_count) == shard_index
+
+    def _to_page(self, title: str, revision: int, body: str, is_html: bool) -> Page:
+        if is_html:
+            page = WikipediaFetcher._parse_page(body)
+            page.title = title
+            page.revision = revision
+            return page
+        return self._page_from_wikitext(title, revision, body)
+
+    def _format(self) -> str:
+        path = self.path.lower()
+        if path.endswith(('.tar.gz', '.tgz', '.tar')):
+            return 'archive'
+        if path.endswith(('.ndjson', '.ndjson.gz', '.jsonl', '.jsonl.gz')):
+            return 'ndjson'
+        return 'xml'
+
+    def _read_records(self) -> Iterator[tuple[str, int, str, bool]]:
+        match self._format():
+            case 'archive':
+                yield from self._read_html_archive()
+            case 'ndjson':
+                with self._open() as f:
+                    yield from self._read_ndjson(f)
+            case _:
+                with self._open() as f:
+                    yield from self._read_xml(f)
+
+    def _get_index(self) -> dict[str, int]:
+        with self.index_lock:
+            if self.index is None:
+                self.index = self._build_index()
+            return self.index
+
+    # Offsets of the records in the decompressed dump by title. XML dumps
+    # have every tag of a page on its own line, so pages are found without
+    # parsing them.
+    def _build_index(self) -> dict[str, int]:
+        if self.multistream_index is not None:
+            return self._read_multistream_index()
+
+        index = {}
+        ndjson = self._format() == 'ndjson'
+        offset, page_offset = 0, None
+        with self._open() as f:
+            for line in f:
+                if ndjson:
+                    if line.strip():
+                        index.setdefault(self._ndjson_name(line), offset)
+                else:
+                    line_start = line.lstrip()
+                    if line_start.startswith(b'<page>'):
+                        page_offset = offset
+                    elif line_start.startswith(b'<title>') and page_offset is not None:
+                        title = line_start[len(b'<title>'):line_start.index(b'</title>')]
+                        index.setdefault(html.unescape(title.decode('utf-8')), page_offset)
+                        page_offset = None
+                offset += len(line)
+        return index
+
+    # Enterprise dumps start every record with its name, so only that string
+    # is decoded. Other records are parsed whole.
+    ndjson_name_field = re.compile(rb'\{\s*"name"\s*:\s*("(?:[^"\\]|\\.)*")')
+
+    @classmethod
+    def _ndjson_name(cls, line: bytes) -> str:
+        if match := cls.ndjson_name_field.match(line):
+            return json.loads(match.group(1))
+        return json.loads(line).get('name')
+
+    # Offsets of the bz2 streams in the compressed dump by title, the index
+    # has an "offset:page id:title" line for every page
+    def _read_multistream_index(self) -> dict[str, int]:
+        index = {}
+        opener = bz2.open if self.multistream_index.endswith('.bz2') else open
+        with opener(self.multistream_index, 'rt', encoding='utf-8') as f:
+            for line in f:
+                offset, _, title = line.rstrip('\n').split(':', 2)
+                index.setdefault(html.unescape(title), int(offset))
+        return index
+
+    # Records of the page at `offset`, empty when it is not an article
+    def _read_record_at(self, offset: int) -> Iterator[tuple[str, int, str, bool]]:
+        if self.multistream_index is not None:
+            yield from self._read_stream_at(offset)
+            return
+
+        with self._open() as f:
+            f.seek(offset)
+            if self._format() == 'ndjson':
+                yield from self._read_ndjson([f.readline()])
+                return
+
+            lines = []
+            for line in f:
+                lines.append(line)
+                if line.lstrip().startswith(b'</page>'):
+                    break
+        yield from self._read_xml(io.BytesIO(b'<mediawiki>' + b''.join(lines) + b'</mediawiki>'))
+
+    # Only the stream at `offset` of a multistream dump is decompressed, it
+    # holds about a hundred pages
+    def _read_stream_at(self, offset: int) -> Iterator[tuple[str, int, str, bool]]:
+        decompressor = bz2.BZ2Decompressor()
+        data = []
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            while not decompressor.eof and (chunk := f.read(64 * 1024)):
+                data.append(decompressor.decompress(chunk))
+        yield from self._read_xml(io.BytesIO(b'<mediawiki>' + b''.join(data) + b'</mediawiki>'))
+
+    def _open(self):
+        if self.path.endswith('.bz2'):
+            return bz2.open(self.path, 'rb')
+        if self.path.endswith('.gz'):
+            return gzip.open(self.path, 'rb')
+        return open(self.path, 'rb')
+
+    def _read_xml(self, f) -> Iterator[tuple[str, int, str, bool]]:
+        root = None
+        for event, element in ET.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = element
+                continue
+
+            if self._local_name(element.tag) != 'page':
+                continue
+
+            revision = element.find('{*}revision')
+            if (
+                element.findtext('{*}ns', '0') != '0'
+                or element.find('{*}redirect') is not None
+                or revision is None
+            ):
+                root.clear()
+                continue
+
+            title = element.findtext('{*}title')
+            revision_id = int(revision.findtext('{*}id') or 0)
+            wikitext = revision.findtext('{*}text') or ''
+            root.clear()
+
+            yield title, revision_id, wikitext, False
+
+    def _read_html_archive(self) -> Iterator[tuple[str, int, str, bool]]:
+        # Stream mode reads members in order without seeking
+        with tarfile.open(self.path, 'r|*') as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                f = archive.extractfile(member)
+                if member.name.endswith('.gz'):
+                    f = gzip.open(f, 'rb')
+                yield from self._read_ndjson(f)
+
+    def _read_ndjson(self, f) -> Iterator[tuple[str, int, str, bool]]:
+        for line in f:
+            if not line.strip():
+                continue
+            article = json.loads(line)
+
+            if article.get('namespace', {}).get('identifier', 0) != 0:
+                continue
+            body = article.get('article_body', {})
+            if 'html' not in body:
+                continue
+
+            revision = article.get('version', {}).get('identifier', 0)
+            yield article['name'], revision, body['html'], True
+
+    def _page_from_wikitext(self, title: str, revision: int, wikitext: str) -> Page:
+        sections = self.converter.convert(wikitext)
+
+        page = Page(title, revision=revision)
+        page.section.paragraphs.extend(
+            self._process_paragraph(p) for p in sections[0].paragraphs
+        )
+        for section in sections[1:]:
+            section.paragraphs = [self._process_paragraph(p) for p in section.paragraphs]
+        self._build_tree(page, sections[1:])
+
+        return page
+
+    @staticmethod
+    def _local_name(tag: str) -> str:
+        return tag.rsplit('}', 1)[-1]
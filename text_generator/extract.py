@@ -0,0 +1,180 @@
+import re
+import html
+from html.parser import HTMLParser
+
+from bs4.dammit import EntitySubstitution
+
+
+class _MainTagClosed(Exception):
+    pass
+
+
+# Single pass alternative to building a BeautifulSoup tree. Collects the text of
+# <p>, <dd> and heading <div> tags below the first tag of the document and
+# repeats the tree fixups of BeautifulSoup's html.parser builder, so the result
+# matches `find_all(...)` + `get_text()` on the same markup.
+class ContentExtractor(HTMLParser):
+    void_tags = frozenset((
+        'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed',
+        'frame', 'hr', 'image', 'img', 'input', 'isindex', 'keygen', 'link',
+        'menuitem', 'meta', 'nextid', 'param', 'source', 'spacer', 'track', 'wbr'
+    ))
+    # Strings inside these tags are not returned by get_text()
+    hidden_tags = frozenset(('rt', 'rp', 'style', 'script', 'template'))
+    heading_tags = frozenset(('h1', 'h2', 'h3', 'h4', 'h5', 'h6'))
+    # <div class="mw-heading mw-heading2"> in current markup
+    heading_classes = frozenset(('heading', 'mw-heading'))
+    preserve_whitespace_tags = frozenset(('pre', 'textarea'))
+    ascii_spaces = '\x20\x0a\x09\x0c\x0d'
+    charref_pattern = re.compile(r'([xX][0-9a-fA-F]+|[0-9]+)(.*)', re.DOTALL)
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+
+        # Open tags and the content entry each of them collects into (or None)
+        self.stack: list[tuple[str, list | None]] = []
+        self.active: list[list[str]] = []
+        self.hidden: int = 0
+        self.preserve: int = 0
+        # Text between two markup events makes one string
+        self.pending: list[str] = []
+        self.closed_void_tags: list[str] = []
+
+        # Entries are [is_heading, text parts, classes, first heading tag]
+        self.content: list[list] = []
+
+    def extract(self, html: str) -> list[tuple[bool, str, list[str], str | None]]:
+        try:
+            self.feed(html)
+            self.close()
+            self._flush()
+        except _MainTagClosed:
+            pass
+
+        return [
+            (is_heading, ''.join(parts), classes, heading_tag)
+            for is_heading, parts, classes, heading_tag in self.content
+        ]
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        self._start(tag, attrs)
+
+        if tag in self.void_tags:
+            self._end(tag)
+            self.closed_void_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush()
+        self._start(tag, attrs)
+        self._end(tag)
+
+    def handle_endtag(self, tag):
+        # Closing tag of a void element is skipped without ending the string
+        if tag in self.closed_void_tags:
+            self.closed_void_tags.remove(tag)
+            return
+        self._flush()
+        self._end(tag)
+
+    def handle_data(self, data):
+        self.pending.append(data)
+
+    # References are resolved the same way BeautifulSoup does it: windows-1252
+    # fixups and U+FFFD for invalid numbers come from html.unescape, control
+    # characters and noncharacters are kept, data after the number is text
+    def handle_charref(self, name):
+        match = self.charref_pattern.match(name)
+        if match is None:
+            self.pending.append(name)
+            return
+
+        number, extra_data = match.groups()
+        code = int(number[1:], 16) if number[0] in 'xX' else int(number)
+        # html.unescape drops the characters it does not allow in HTML
+        self.pending.append(html.unescape(f"&#{number};") or chr(code))
+        self.pending.append(extra_data)
+
+    def handle_entityref(self, name):
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self.pending.append(character if character is not None else f"&{name}")
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def unknown_decl(self, data):
+        self._flush()
+
+        # CDATA is kept even inside hidden tags
+        if data.upper().startswith('CDATA['):
+            self._append(data[len('CDATA['):])
+
+    def _flush(self):
+        if not self.pending:
+            return
+        data = ''.join(self.pending)
+        self.pending.clear()
+
+        if not self.hidden:
+            self._append(data)
+
+    def _append(self, data):
+        if not data or not self.active:
+            return
+
+        # Whitespace-only strings are collapsed to a single character
+        if not self.preserve and not data.strip(self.ascii_spaces):
+            data = '\n' if '\n' in data else ' '
+
+        for parts in self.active:
+            parts.append(data)
+
+    def _start(self, tag, attrs):
+        entry = None
+        if self.stack:
+            if tag in self.heading_tags:
+                for _, e in self.stack:
+                    if e is not None and e[0] and e[3] is None:
+                        e[3] = tag
+
+            if tag == 'p' or tag == 'dd':
+                entry = [False, [], None, None]
+            elif tag == 'div':
+                classes = (dict(attrs).get('class') or '').split()
+                if not self.heading_classes.isdisjoint(classes):
+                    entry = [True, [], classes, None]
+
+            if entry is not None:
+                self.content.append(entry)
+                self.active.append(entry[1])
+
+        self.stack.append((tag, entry))
+        if tag in self.hidden_tags:
+            self.hidden += 1
+        if tag in self.preserve_whitespace_tags:
+            self.preserve += 1
+
+    def _end(self, tag):
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                break
+        else:
+            return
+
+        while len(self.stack) > i:
+            name, entry = self.stack.pop()
+            if entry is not None:
+                self.active.pop()
+            if name in self.hidden_tags:
+                self.hidden -= 1
+            if name in self.preserve_whitespace_tags:
+                self.preserve -= 1
+
+        if not self.stack:
+            raise _MainTagClosed()
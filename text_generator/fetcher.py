@@ -0,0 +1,105 @@
+import re
+import abc
+import dataclasses
+import unicodedata
+from typing import Callable
+
+from .dedup import fingerprint
+
+
+# Raised by fetchers that have no more pages to hand out, e.g. at the end of a
+# dump. TextGenerator stops after the pages that were already fetched.
+class PagesExhausted(EOFError):
+    pass
+
+
+@dataclasses.dataclass
+class Section:
+    title: str
+    level: int
+
+    paragraphs: list[str] = dataclasses.field(default_factory=list)
+    subsections: list['Section'] = dataclasses.field(default_factory=list)
+
+    def get_nested_paragraphs(self):
+        paragraphs = self.paragraphs.copy()
+
+        for subsection in self.subsections:
+            paragraphs.extend(subsection.get_nested_paragraphs())
+        return paragraphs
+
+
+@dataclasses.dataclass
+class Page:
+    title: str = ""
+    section: Section = dataclasses.field(default_factory=lambda: Section('Main', 1))
+    revision: int = 0
+    # sections: list[Section] = dataclasses.field(default_factory=list)
+
+    def get_all_paragraphs(self):
+        return self.section.get_nested_paragraphs()
+
+
+class BaseFetcher(abc.ABC):
+    @abc.abstractmethod
+    def get_article(self, title) -> Page:
+        pass
+
+    @abc.abstractmethod
+    def get_random_article(self) -> Page:
+        pass
+
+    # Draws the next random page and returns a function that fetches it.
+    # Draws are cheap and made one at a time, the returned functions can run
+    # concurrently. By default the page is fetched while drawing.
+    def draw_random_article(self) -> Callable[[], Page]:
+        page = self.get_random_article()
+        return lambda: page
+
+    def get_random_text(self) -> str:
+        return ' '.join(self.get_random_article().get_all_paragraphs())
+
+    # Titles that should not be fetched again, e.g. after resuming a run
+    def skip_titles(self, titles):
+        pass
+
+    # Only the titles of this shard (see title_shard) are used, fetchers that
+    # know the titles before parsing drop the other ones early
+    def keep_shard(self, shard_index: int, shard_count: int):
+        pass
+
+    # Titles are split between `shard_count` independent runs by their hash,
+    # every run only works with the titles of its shard
+    @staticmethod
+    def title_shard(title: str, shard_count: int) -> int:
+        return fingerprint(title) % shard_count
+
+    @classmethod
+    def _build_tree(cls, page: Page, sections: list[Section]):
+        sections = list(filter(cls._filter_section, sections))
+        
+        # Create tree structure
+        stack = [page.section]
+        for section in sections:
+            level = section.level
+
+            while stack[-1].level >= level:
+                stack.pop()
+
+            parent = stack[-1]
+            parent.subsections.append(section)          
+            stack.append(section)
+
+    @staticmethod
+    def _process_paragraph(paragraph) -> str:
+        # Uncompress unicode characters
+        paragraph = unicodedata.normalize('NFD', paragraph)
+
+        # Remove sources (vile!)
+        paragraph = re.sub('\[\d+\]', '', paragraph)
+
+        return paragraph
+
+    @staticmethod
+    def _filter_section(section: Section) -> bool:
+        return section.title != 'Примечания'
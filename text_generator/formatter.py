@@ -1,6 +1,12 @@
 import re
+import sys
+import threading
 import unicodedata
 from string import *
+from typing import Iterable, Iterator
+
+from .accent import AccentCache, CachedAccentor
+from .metrics import Metrics, NULL_METRICS
 
 # from .allowed import ALLOWED_SYMBOLS
 
@@ -20,48 +26,173 @@ RUSSIAN_ALPHABET = CONSONANTS + VOWELS + 'ьъЬЪ'
 COMBINING_ACUTE = '\u0301'
 APOSTROPHE = '\u0027'
 
+YOT_TABLE = {
+    'я': 'jа',
+    'ё': 'jо',
+    'ю': 'jу',
+    'и': 'jи',
+    'е': 'jе',
+}
+
+# Both rules only look at the previous character of their input, so a
+# lookbehind substitution gives the same result as a character by character scan
+SOFTNESS_PATTERN = re.compile(f'(?<=[{PAIRED_CONSONANTS}])(?=[{SOFT_VOWELS}])')
+YOTS_PATTERN = re.compile(f'(?<=[{VOWELS}])[{SOFT_VOWELS}]')
+# Replacements of lowercase and uppercase soft vowels
+YOTS = {vowel: YOT_TABLE[vowel.lower()] for vowel in SOFT_VOWELS}
+
+SHORT_PAUSES = {ord(','): ' / '}
+LONG_PAUSE_PATTERN = re.compile(r'[\?\!\.]+ ')
+LONG_PAUSE = '//'
+
 
 class TranscriptionFormatter:
     _accentor = None
+    _accentor_lock = threading.Lock()
+
+    # Characters whose decomposition has an acute, built on first use
+    _acute_decompositions: dict[str, str] = None
+    _acute_pattern: re.Pattern = None
+
+    # Batches of texts are joined up to this size for one accentor call,
+    # spaCy refuses texts longer than 1,000,000 characters
+    accent_batch_chars = 500_000
+
+    def __init__(
+        self, accent_cache: AccentCache=None, metrics: Metrics=None, stress_snapshot: str=None
+    ):
+        # The Normalizer is loaded on the first accented text, from a
+        # memory-mapped StressSnapshot when it is given
+        self.stress_snapshot = stress_snapshot
 
-    def __init__(self):
-        if TranscriptionFormatter._accentor is None:
-            from tsnorm import Normalizer
-            TranscriptionFormatter._accentor = Normalizer(stress_mark=COMBINING_ACUTE, stress_mark_pos="after", stress_yo=True, stress_monosyllabic=True)
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+
+        # Words are accented from the cache, ambiguous ones in context
+        self.accent_cache = accent_cache
+        self.cached_accentor = None
         
     def format(self, text: str, add_accents=True, add_pauses=True, add_softness=True, add_yots=True) -> str:        
+        text = self.format_paragraph(text, add_accents, add_softness, add_yots)
+        return self._add_pauses_and_spaces(text, add_pauses)
+
+    # Passes of `format` that only depend on the text of one paragraph, the
+    # whitespace is kept for _add_pauses
+    def format_paragraph(self, text: str, add_accents=True, add_softness=True, add_yots=True) -> str:
         if add_accents:
-            text = self._add_accents(text)
-        if not text:
-            return ""
+            with self.metrics.timer('accent'):
+                text = self._add_accents(text)
+        return self._add_sounds(text, add_softness, add_yots)
 
-        if add_softness:
-            text = self._add_softness(text)
-        if add_yots:
-            text = self._add_yots(text)
+    # Batch versions of format and format_paragraph. Texts are accented with
+    # one accentor call per batch, the results are aligned with the texts and
+    # a text that failed is replaced with its exception.
+    def format_many(
+        self, texts: list[str], add_accents=True, add_pauses=True, add_softness=True, add_yots=True
+    ) -> list[str | Exception]:
+        return [
+            text if isinstance(text, Exception) else self._try(self._add_pauses_and_spaces, text, add_pauses)
+            for text in self.format_paragraphs(texts, add_accents, add_softness, add_yots)
+        ]
 
-        if add_pauses:
-            text = self._add_pauses(text)
+    def format_paragraphs(
+        self, paragraphs: list[str], add_accents=True, add_softness=True, add_yots=True
+    ) -> list[str | Exception]:
+        texts = self._add_accents_many(paragraphs) if add_accents else list(paragraphs)
+        return [
+            text if isinstance(text, Exception) else self._try(self._add_sounds, text, add_softness, add_yots)
+            for text in texts
+        ]
 
-        text = ' '.join(text.split())
-        return text
+    # Same words as format(' '.join(paragraphs)).split(), produced one
+    # paragraph at a time, so memory does not grow with the number of
+    # paragraphs. Only the accents may differ, the accentor sees one
+    # paragraph instead of the whole text.
+    def iter_words(
+        self, paragraphs: Iterable[str], add_accents=True, add_pauses=True, add_softness=True, add_yots=True
+    ) -> Iterator[str]:
+        texts = (self.format_paragraph(p, add_accents, add_softness, add_yots) for p in paragraphs)
+        return self.iter_formatted_words(texts, add_pauses)
+
+    # Sentences between long pauses of iter_words, without the pause marks
+    def iter_sentences(
+        self, paragraphs: Iterable[str], add_accents=True, add_softness=True, add_yots=True
+    ) -> Iterator[str]:
+        sentence = []
+        for word in self.iter_words(paragraphs, add_accents, True, add_softness, add_yots):
+            if word != LONG_PAUSE:
+                sentence.append(word)
+            elif sentence:
+                yield ' '.join(sentence)
+                sentence = []
+        if sentence:
+            yield ' '.join(sentence)
+
+    # Words of paragraphs that went through format_paragraph. A paragraph
+    # ending with .!? ends a sentence only when another paragraph follows it,
+    # so each paragraph is split once the next one arrives. Sentences may span
+    # paragraphs: the first word of a sentence is capitalized and the others
+    # are lowercased, the same as str.capitalize on the whole sentence.
+    @staticmethod
+    def iter_formatted_words(texts: Iterable[str], add_pauses=True) -> Iterator[str]:
+        if not add_pauses:
+            for text in texts:
+                yield from text.split()
+            return
+
+        sentence_start = True
+        previous = None
+        for text in texts:
+            if previous is not None:
+                sentence_start = yield from TranscriptionFormatter._pause_words(previous + ' ', sentence_start)
+            previous = text
+        if previous is not None:
+            yield from TranscriptionFormatter._pause_words(previous, sentence_start)
 
     @staticmethod
     def _decompose_acutes(text: str) -> str:
-        result = ""
-        for char in text:
-            decomposed = unicodedata.normalize('NFD', char) 
-            if COMBINING_ACUTE in decomposed:
-                result += decomposed
-            else:
-                result += char 
-        return result
+        if TranscriptionFormatter._acute_pattern is None:
+            decompositions = {}
+            for char in map(chr, range(sys.maxunicode + 1)):
+                decomposed = unicodedata.normalize('NFD', char)
+                if COMBINING_ACUTE in decomposed:
+                    decompositions[char] = decomposed
+
+            TranscriptionFormatter._acute_decompositions = decompositions
+            TranscriptionFormatter._acute_pattern = re.compile(f"[{''.join(decompositions)}]")
+
+        decompositions = TranscriptionFormatter._acute_decompositions
+        return TranscriptionFormatter._acute_pattern.sub(lambda m: decompositions[m.group()], text)
 
     @staticmethod
-    def _add_accents(text: str) -> str:
+    def _load_accentor(stress_snapshot: str=None):
+        with TranscriptionFormatter._accentor_lock:
+            if TranscriptionFormatter._accentor is None:
+                options = dict(stress_mark=COMBINING_ACUTE, stress_mark_pos="after", stress_yo=True, stress_monosyllabic=True)
+                if stress_snapshot is not None:
+                    from .stress import create_normalizer
+                    TranscriptionFormatter._accentor = create_normalizer(stress_snapshot, **options)
+                else:
+                    from tsnorm import Normalizer
+                    TranscriptionFormatter._accentor = Normalizer(**options)
+        return TranscriptionFormatter._accentor
+
+    def _add_accents(self, text: str) -> str:
         normalized = TranscriptionFormatter._decompose_acutes(text)
 
-        text = TranscriptionFormatter._accentor(normalized)
+        accentor = TranscriptionFormatter._accentor
+        if accentor is None:
+            accentor = self._load_accentor(self.stress_snapshot)
+
+        if self.accent_cache is not None:
+            if self.cached_accentor is None:
+                self.cached_accentor = CachedAccentor(
+                    accentor, self.accent_cache, TranscriptionFormatter._accentor_lock
+                )
+            return self.cached_accentor(normalized)
+
+        # The accentor is shared between all formatters and threads
+        with TranscriptionFormatter._accentor_lock:
+            text = accentor(normalized)
 
         # Filter all non-word symbols
         # words = list()
@@ -81,45 +212,103 @@ class TranscriptionFormatter:
 
     @staticmethod
     def _add_softness(text: str) -> str:
-        result = text[0]
-        for i in range(1, len(text)):
-            previous, current = text[i-1], text[i]
+        return SOFTNESS_PATTERN.sub(APOSTROPHE, text)
 
-            if current in SOFT_VOWELS and previous in PAIRED_CONSONANTS:
-                result += APOSTROPHE
-            result += current
+    @staticmethod
+    def _add_sounds(text: str, add_softness: bool, add_yots: bool) -> str:
+        if not text:
+            return ""
+
+        if add_softness:
+            text = TranscriptionFormatter._add_softness(text)
+        if add_yots:
+            text = TranscriptionFormatter._add_yots(text)
+        return text
+
+    @staticmethod
+    def _add_pauses_and_spaces(text: str, add_pauses: bool) -> str:
+        if not text:
+            return ""
+
+        if add_pauses:
+            text = TranscriptionFormatter._add_pauses(text)
+
+        text = ' '.join(text.split())
+        return text
+
+    @staticmethod
+    def _try(function, *args) -> str | Exception:
+        try:
+            return function(*args)
+        except Exception as e:
+            return e
 
-        return result
+    # Texts are joined with newlines, which the accentor keeps, into batches
+    # of up to accent_batch_chars characters. Texts with newlines of their own
+    # are accented one by one, a batch that failed or lost its newlines is
+    # split in halves until the failed texts are found.
+    def _add_accents_many(self, texts: list[str]) -> list[str | Exception]:
+        results: list[str | Exception] = [None] * len(texts)
+
+        batches, batch, size = [], [], 0
+        for i, text in enumerate(texts):
+            if '\n' in text:
+                batches.append([i])
+                continue
+            if batch and size + len(text) > self.accent_batch_chars:
+                batches.append(batch)
+                batch, size = [], 0
+            batch.append(i)
+            size += len(text) + 1
+        if batch:
+            batches.append(batch)
+
+        while batches:
+            batch = batches.pop()
+            with self.metrics.timer('accent'):
+                accented = self._try(self._add_accents, '\n'.join(texts[i] for i in batch))
+
+            if len(batch) == 1:
+                results[batch[0]] = accented
+                continue
+            if not isinstance(accented, Exception):
+                accented = accented.split('\n')
+                if len(accented) == len(batch):
+                    for i, text in zip(batch, accented):
+                        results[i] = text
+                    continue
+
+            middle = len(batch) // 2
+            batches.extend((batch[middle:], batch[:middle]))
+        return results
+
+    # Yields the words of one piece of text with pauses and returns whether
+    # the next word starts a sentence
+    @staticmethod
+    def _pause_words(text: str, sentence_start: bool) -> Iterator[str]:
+        for i, piece in enumerate(LONG_PAUSE_PATTERN.split(text.translate(SHORT_PAUSES))):
+            if i:
+                yield LONG_PAUSE
+                sentence_start = True
+            for word in piece.split():
+                if sentence_start:
+                    yield word.capitalize()
+                    sentence_start = False
+                else:
+                    yield word.lower()
+        return sentence_start
 
     @staticmethod
     def _add_pauses(text: str) -> str: 
-        short_pauses = text.translate(
-            {ord(c): ' / ' for c in ','}
-        )
+        short_pauses = text.translate(SHORT_PAUSES)
         
-        sentences = re.split('[\?\!\.]+ ', short_pauses)
+        sentences = LONG_PAUSE_PATTERN.split(short_pauses)
         sentences = [' '.join(sentence.split()) for sentence in sentences]
         sentences = [sentence.capitalize() for sentence in sentences]
 
-        long_pauses = ' // '.join(sentences)
+        long_pauses = f' {LONG_PAUSE} '.join(sentences)
         return long_pauses
         
     @staticmethod
     def _add_yots(text: str) -> str:
-        yot_table = {
-            'я': 'jа',
-            'ё': 'jо',
-            'ю': 'jу',
-            'и': 'jи',
-            'е': 'jе',
-        }
-
-        result = text[0]
-        for i in range(1, len(text)):
-            previous, current = text[i-1], text[i]
-
-            if previous in VOWELS and current in SOFT_VOWELS:
-                result += yot_table[current.lower()]
-            else:
-                result += current
-        return result
+        return YOTS_PATTERN.sub(lambda m: YOTS[m.group()], text)
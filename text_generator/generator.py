@@ -1,90 +1,574 @@
+import re
+import copy
+import queue
+import asyncio
 import random
+import itertools
+import threading
+from typing import Callable, Iterable, Iterator, AsyncIterator
 
-import tqdm
-
-from .wiki import WikipediaFetcher
+from .fetcher import BaseFetcher, Page, PagesExhausted
+from .accent import AccentCache
 from .formatter import TranscriptionFormatter
+from .pool import FormatterPool
+from .dedup import BaseDedupStore, FingerprintStore
+from .checkpoint import Checkpoint
+from .sink import BaseSink
+from .metrics import Metrics, NULL_METRICS
 from .paragraph import DialecticParagraphProcessor
+from .paragraph.base import BaseParagraphProcessor
 from .paragraph.dialectic import Alphabet
 
 
+# Numbers pages and hands out their results in that order. At most `limit`
+# numbers are in flight (handed out and not popped yet), so the results that
+# wait for a slow page stay bounded.
+class ResultOrder:
+    def __init__(self, limit: int):
+        self.pending: dict[int, tuple[str, list[str]]] = {}
+        self.next_index = 0
+
+        self.sequence = itertools.count()
+        self.slots = threading.Semaphore(limit)
+
+    # Waits for a free slot, False when stopped
+    def acquire(self, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            if self.slots.acquire(timeout=0.1):
+                return True
+        return False
+
+    def release(self):
+        self.slots.release()
+
+    def number(self) -> int:
+        return next(self.sequence)
+
+    def push(self, index: int, result: tuple[str, list[str]]):
+        self.pending[index] = result
+
+    def pop(self) -> tuple[str, list[str]] | None:
+        result = self.pending.pop(self.next_index, None)
+        if result is not None:
+            self.next_index += 1
+            self.slots.release()
+        return result
+
+
+# Workers of one kind that are still running
+class WorkerCount:
+    def __init__(self, count: int):
+        self.count = count
+        self.lock = threading.Lock()
+
+    # Returns True for the last worker to finish
+    def finish(self) -> bool:
+        with self.lock:
+            self.count -= 1
+            return self.count == 0
+
+
 class TextGenerator:
-    def __init__(self):
-        self.fetcher = WikipediaFetcher()
-        self.formatter = TranscriptionFormatter()
+    # Sentences keep the symbols of the alphabet and need a dialectic mark
+    disallowed_pattern = DialecticParagraphProcessor.disallowed_pattern
+    dialectic_pattern = re.compile("[{}]".format(re.escape(Alphabet.dialectic)))
+
+    # Paragraphs formatted at once (one accentor call, or one chunk per pool
+    # worker) and words split into sentences at once, both bound the memory
+    # used for a page
+    format_batch = 256
+    split_batch = 8192
+
+    def __init__(
+        self, fetch_workers: int=1, process_workers: int=1, queue_size: int=16,
+        fetcher: BaseFetcher=None, format_workers: int=0, dedup: BaseDedupStore=None,
+        checkpoint: Checkpoint=None, shard_index: int=0, shard_count: int=1,
+        metrics: Metrics=None, stress_snapshot: str=None, seed: int=None,
+        accent_cache: AccentCache=None
+    ):
+        # Stage timers and counters, no-ops unless metrics are given
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+
+        # Each of `shard_count` generators only uses the titles of its shard
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+
+        if fetcher is None:
+            from .wiki import WikipediaFetcher
+            fetcher = WikipediaFetcher(
+                shard_index=shard_index, shard_count=shard_count, metrics=self.metrics
+            )
+        if shard_count > 1:
+            fetcher.keep_shard(shard_index, shard_count)
+        self.fetcher = fetcher
+        # The stress dictionary is read from this snapshot file when given,
+        # see StressSnapshot. Accents of words are memoized in `accent_cache`
+        # when given.
+        self.formatter = TranscriptionFormatter(
+            accent_cache=accent_cache, metrics=self.metrics, stress_snapshot=stress_snapshot
+        )
         self.processor = DialecticParagraphProcessor()
 
         self.max_retries = 3
 
+        # Shared by all runs of this generator when given, a new one per run otherwise
+        self.dedup = dedup
+        # Sentences, dedup state and used titles are flushed here and a new
+        # run continues from them
+        self.checkpoint = checkpoint
+
+        # Fetchers fill a bounded queue of pages, processors drain it
+        self.fetch_workers = fetch_workers
+        self.process_workers = process_workers
+        self.queue_size = queue_size
+
+        # With a seed every page is split with its own RNG, derived from the
+        # seed and the title, and pages are used in the order of the source.
+        # The same seed and source give the same sentences with any number
+        # of workers.
+        self.seed = seed
+        self._fetch_lock = threading.Lock()
+
+        # Formatting runs in separate processes, one Normalizer per process.
+        # Every process has its own accent cache of the same size, started
+        # from the file of `accent_cache`.
+        self.formatter_pool = FormatterPool(
+            format_workers, stress_snapshot=stress_snapshot,
+            accent_cache_size=accent_cache.max_size if accent_cache is not None else None,
+            accent_cache_path=accent_cache.path if accent_cache is not None else None
+        ) if format_workers else None
+
+    def close(self):
+        if self.formatter_pool is not None:
+            self.formatter_pool.close()
+
     def generate_text_chunks(
         self, amount, max_word_len=40, min_words=2, max_words=4
     ):
-        sentences = set()
+        sentences = []
+        if self.checkpoint is not None:
+            sentences.extend(itertools.islice(self.checkpoint.sentences(), amount))
+            if len(sentences) >= amount:
+                return sentences
+
+        import tqdm
+        progress = tqdm.tqdm(total=amount, initial=len(sentences))
+        try:
+            for sentence in self.iter_text_chunks(amount, max_word_len, min_words, max_words):
+                sentences.append(sentence)
+                progress.update()
+        finally:
+            progress.close()
+
+        return sentences
 
-        progress = tqdm.tqdm(total=amount)
-        while len(sentences) < amount:
-            sentences_list = []
+    # Writes sentences to a sink as they are produced, with the source title
+    # as metadata. Returns the number of written sentences.
+    def write_text_chunks(
+        self, sink: BaseSink, amount=None, max_word_len=40, min_words=2, max_words=4,
+        metadata=True
+    ) -> int:
+        written = 0
+        try:
+            for sentence, sentence_metadata in self.iter_text_chunks(
+                amount, max_word_len, min_words, max_words, metadata=True
+            ):
+                sink.write(sentence, sentence_metadata if metadata else None)
+                written += 1
+        finally:
+            sink.flush()
+        return written
 
-            retries = self.max_retries
-            while retries:
+    # Yields unique sentences as soon as they are produced, or (sentence,
+    # metadata) pairs with `metadata`. Workers stop when the results queue is
+    # full, so a slow consumer holds the whole pipeline, and closing the
+    # generator (or leaving the loop) stops them.
+    def iter_text_chunks(
+        self, amount=None, max_word_len=40, min_words=2, max_words=4, metadata=False
+    ) -> Iterator[str | tuple[str, dict]]:
+        seen, produced = self._start_run()
+
+        results, stop, workers, order = self._start_workers(max_word_len, min_words, max_words)
+        try:
+            while amount is None or produced < amount:
                 try:
-                    page = self.fetcher.get_random_article()
-                    break
-                except Exception as e:
-                    print(f"Exception: {e}, retries: {retries}")
-                    retries -= 1
-            else:
-                raise RuntimeError(f"Failed to fetch a page from Wikipedia {self.max_retries} times.")
+                    title, sentences_list = self._next_results(results, stop, order)
+                except PagesExhausted:
+                    return
+                limit = amount - produced if amount is not None else None
+                for sentence in self._accept(title, sentences_list, seen, limit):
+                    produced += 1
+                    yield (sentence, {'title': title}) if metadata else sentence
+        finally:
+            self._stop_workers(stop, workers)
+            self._end_run()
+
+    # Same as iter_text_chunks, waiting for the workers in the default executor.
+    # Cancelling the consuming task stops the workers.
+    async def aiter_text_chunks(
+        self, amount=None, max_word_len=40, min_words=2, max_words=4, metadata=False
+    ) -> AsyncIterator[str | tuple[str, dict]]:
+        loop = asyncio.get_running_loop()
+        seen, produced = self._start_run()
 
-            paragraphs = []
-            for p in page.get_all_paragraphs():
+        results, stop, workers, order = self._start_workers(max_word_len, min_words, max_words)
+        try:
+            while amount is None or produced < amount:
                 try:
-                    processed = self.processor.process(p)
-                    paragraphs.append(processed)
-                except Exception as e:
-                    print(page.title)
-                    print(f"Exception: {e}")
-                    paragraphs.append(p)
-            
-            words = []
-
-            start_index, end_index = 0, 0
-            while end_index < len(paragraphs):
-                text_length = 0
-
-                while (
-                    end_index < len(paragraphs) and 
-                    (text_length := text_length + len(paragraphs[end_index]) + (end_index - start_index > 0)) < 500_000
-                ):
-                    end_index += 1
-                
-                text = ' '.join(paragraphs[start_index:end_index])
-                text = self.formatter.format(text)
-                words.extend(
-                    word for word in text.split(" ") if len(word) < max_word_len
+                    title, sentences_list = await loop.run_in_executor(
+                        None, self._next_results, results, stop, order
+                    )
+                except PagesExhausted:
+                    return
+                limit = amount - produced if amount is not None else None
+                for sentence in self._accept(title, sentences_list, seen, limit):
+                    produced += 1
+                    yield (sentence, {'title': title}) if metadata else sentence
+        finally:
+            stop.set()
+            await loop.run_in_executor(None, self._stop_workers, stop, workers)
+            self._end_run()
+
+    def _start_run(self) -> tuple[BaseDedupStore, int]:
+        seen = self.dedup if self.dedup is not None else FingerprintStore()
+        if self.checkpoint is None:
+            return seen, 0
+
+        self.checkpoint.restore(seen)
+        self.fetcher.skip_titles(self.checkpoint.titles)
+        return seen, len(self.checkpoint)
+
+    def _end_run(self):
+        if self.checkpoint is not None:
+            self.checkpoint.flush()
+
+    # Returns new sentences of a page, at most `limit` of them. With a
+    # checkpoint pages that were already used are skipped, a page only counts
+    # as used once all of its sentences were taken.
+    def _accept(
+        self, title: str | None, sentences_list: list[str], seen: BaseDedupStore, limit: int | None
+    ) -> list[str]:
+        checkpoint = self.checkpoint
+        if checkpoint is not None and title is not None:
+            if title in checkpoint.titles:
+                self.metrics.increment('pages_already_used')
+                return []
+
+        accepted = []
+        for sentence in sentences_list:
+            if limit is not None and len(accepted) >= limit:
+                # The rest of the page is used when a resumed run fetches it
+                # again, the sentences taken now are skipped as duplicates
+                title = None
+                break
+            if not seen.add(sentence):
+                self.metrics.increment('duplicates')
+                continue
+            accepted.append(sentence)
+
+            if checkpoint is not None and checkpoint.add_sentence(sentence):
+                checkpoint.flush()
+
+        if checkpoint is not None and title is not None:
+            checkpoint.add_title(title)
+        self.metrics.increment('sentences', len(accepted))
+        return accepted
+
+    def _start_workers(
+        self, max_word_len, min_words, max_words
+    ) -> tuple[queue.Queue, threading.Event, list[threading.Thread], ResultOrder | None]:
+        stop = threading.Event()
+        pages = queue.Queue(self.queue_size)
+        results = queue.Queue(self.queue_size)
+
+        # Fetched pages are numbered to restore their order after processing,
+        # as many pages as the queues and the workers hold can be in flight
+        order = None
+        if self.seed is not None:
+            order = ResultOrder(2 * self.queue_size + self.fetch_workers + self.process_workers)
+
+        # When the fetcher runs out of pages the last fetch worker sends an end
+        # marker after the pages, the last process worker passes it on after
+        # the results
+        fetching, processing = WorkerCount(self.fetch_workers), WorkerCount(self.process_workers)
+
+        workers = [
+            threading.Thread(
+                target=self._fetch_worker, args=(pages, results, stop, order, fetching), daemon=True
+            )
+            for _ in range(self.fetch_workers)
+        ]
+        workers.extend(
+            threading.Thread(
+                target=self._process_worker,
+                args=(pages, results, stop, processing, max_word_len, min_words, max_words),
+                daemon=True
+            )
+            for _ in range(self.process_workers)
+        )
+
+        for worker in workers:
+            worker.start()
+        return results, stop, workers, order
+
+    @staticmethod
+    def _stop_workers(stop: threading.Event, workers: list[threading.Thread]):
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+    @staticmethod
+    def _next_results(
+        results: queue.Queue, stop: threading.Event, order: ResultOrder=None
+    ) -> tuple[str | None, list[str]]:
+        while not stop.is_set():
+            if order is not None and (result := order.pop()) is not None:
+                return result
+
+            try:
+                result = results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            if isinstance(result, PagesExhausted) and order is not None and order.pending:
+                # Every page is processed, the results waiting for their turn
+                # come first
+                results.put(result)
+                continue
+            if isinstance(result, Exception):
+                raise result
+            index, title, sentences_list = result
+            if order is None:
+                return title, sentences_list
+            order.push(index, (title, sentences_list))
+        return None, []
+
+    def _fetch_worker(
+        self, pages: queue.Queue, results: queue.Queue, stop: threading.Event,
+        order: ResultOrder | None, fetching: WorkerCount
+    ):
+        while not stop.is_set():
+            try:
+                index, page = self._fetch_next(order, stop)
+            except PagesExhausted as e:
+                if fetching.finish():
+                    self._put(pages, e, stop)
+                return
+            except Exception as e:
+                self._put(results, e, stop)
+                return
+
+            if page is not None:
+                self._put(pages, (index, page), stop)
+            elif index is not None:
+                # The number is taken, ResultOrder gets an empty result for it
+                self._put(results, (index, None, []), stop)
+
+    # Returns the next page and its number, without the page for pages of
+    # other shards and (None, None) when stopped. Pages are numbered in the
+    # order they are drawn from the fetcher, one draw at a time, and fetched
+    # concurrently.
+    def _fetch_next(
+        self, order: ResultOrder | None, stop: threading.Event
+    ) -> tuple[int | None, Page | None]:
+        if order is None:
+            index, page = None, self._fetch_page(self.fetcher.get_random_article)
+        else:
+            if not order.acquire(stop):
+                return None, None
+            try:
+                with self._fetch_lock:
+                    fetch = self._retry(self.fetcher.draw_random_article)
+                    index = order.number()
+            except Exception:
+                order.release()
+                raise
+            page = self._fetch_page(fetch)
+
+        if not self._owns(page.title):
+            self.metrics.increment('pages_other_shard')
+            return index, None
+        return index, page
+
+    def _process_worker(
+        self, pages: queue.Queue, results: queue.Queue, stop: threading.Event,
+        processing: WorkerCount, max_word_len, min_words, max_words
+    ):
+        # Tokenizer and parser keep their state on the instance
+        processor = copy.deepcopy(self.processor)
+
+        while not stop.is_set():
+            try:
+                item = pages.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            if isinstance(item, PagesExhausted):
+                # Leaves the marker for the other process workers
+                self._put(pages, item, stop)
+                if processing.finish():
+                    self._put(results, item, stop)
+                return
+            index, page = item
+
+            try:
+                sentences_list = self._page_to_sentences(
+                    page, processor, max_word_len, min_words, max_words,
+                    self._page_random(page.title)
                 )
-                
-                start_index = end_index
-            
-            while len(words) > max_words:
-                sentence_len = random.randint(min_words, max_words)
-                sentence = " ".join(words[:max_words])
-                words = words[sentence_len:]
-
-                sentence = ''.join(filter(lambda s: s in Alphabet.allowed_symbols, sentence))
-                if not sentence:
-                    continue
-                if not any(
-                    symbol in sentence for symbol in Alphabet.dialectic   
-                ):
+            except Exception as e:
+                self._put(results, e, stop)
+                return
+            self._put(results, (index, page.title, sentences_list), stop)
+
+    def _page_random(self, title: str) -> random.Random | None:
+        if self.seed is None:
+            return None
+        # String seeds are hashed with SHA-512, independent of PYTHONHASHSEED
+        return random.Random(f"{self.seed}:{title}")
+
+    def _owns(self, title: str) -> bool:
+        return self.shard_count == 1 or BaseFetcher.title_shard(title, self.shard_count) == self.shard_index
+
+    def _fetch_page(self, fetch: Callable[[], Page]) -> Page:
+        with self.metrics.timer('fetch'):
+            page = self._retry(fetch)
+        self.metrics.increment('pages_fetched')
+        return page
+
+    def _retry(self, function: Callable):
+        retries = self.max_retries
+        while retries:
+            try:
+                return function()
+            except PagesExhausted:
+                raise
+            except Exception as e:
+                print(f"Exception: {e}, retries: {retries}")
+                self.metrics.increment('fetch_retries')
+                retries -= 1
+        raise RuntimeError(f"Failed to fetch a page from Wikipedia {self.max_retries} times.")
+
+    def _page_to_sentences(
+        self, page: Page, processor: BaseParagraphProcessor,
+        max_word_len, min_words, max_words, rng: random.Random=None
+    ) -> list[str]:
+        metrics = self.metrics
+
+        paragraphs = []
+        with metrics.timer('process'):
+            raw_paragraphs = page.get_all_paragraphs()
+            for p, processed in zip(raw_paragraphs, processor.process_many(raw_paragraphs)):
+                if isinstance(processed, Exception):
+                    print(page.title)
+                    print(f"Exception: {processed}")
+                    metrics.increment('paragraph_fallbacks')
+                    processed = p
+                paragraphs.append(processed)
+        metrics.observe('page_paragraphs', len(paragraphs))
+
+        # Paragraphs are formatted and split into sentences as a stream, the
+        # whole page is never joined or split into words at once
+        words = (
+            word for word in self._format_words(paragraphs) if len(word) < max_word_len
+        )
+        sentences_list = list(self._iter_sentences(words, min_words, max_words, metrics, rng))
+        metrics.observe('page_sentences', len(sentences_list))
+        return sentences_list
+
+    def _format_words(self, paragraphs: list[str]) -> Iterator[str]:
+        return TranscriptionFormatter.iter_formatted_words(self._format_paragraphs(paragraphs))
+
+    # Paragraphs that fail to format are left out
+    def _format_paragraphs(self, paragraphs: list[str]) -> Iterator[str]:
+        metrics = self.metrics
+        formatter = self.formatter_pool if self.formatter_pool is not None else self.formatter
+
+        for i in range(0, len(paragraphs), self.format_batch):
+            with metrics.timer('format'):
+                texts = formatter.format_paragraphs(paragraphs[i:i + self.format_batch])
+
+            for text in texts:
+                if isinstance(text, Exception):
+                    metrics.increment('format_failures')
                     continue
-                
-                sentences_list.append(sentence)
+                yield text
 
-            sentences = sentences | set(sentences_list)
-            progress.n = len(sentences)
-            progress.refresh()
+    @classmethod
+    def _split_sentences(
+        cls, words: list[str], min_words, max_words, metrics: Metrics=NULL_METRICS,
+        rng: random.Random=None
+    ) -> list[str]:
+        return list(cls._iter_sentences(words, min_words, max_words, metrics, rng))
 
-        progress.close()
-        sentences = list(sentences)[:amount]
-        return sentences
+    # Sentences are windows of `max_words` words, each one starting
+    # randint(min_words, max_words) words after the previous one, drawn from
+    # `rng` or the global random state. Words are split in batches: a batch
+    # stops at the first window that could reach past its end and the words
+    # from there on start the next batch, so the sentences and the random
+    # draws are the same as for the whole list at once.
+    @classmethod
+    def _iter_sentences(
+        cls, words: Iterable[str], min_words, max_words, metrics: Metrics=NULL_METRICS,
+        rng: random.Random=None
+    ) -> Iterator[str]:
+        randint = rng.randint if rng is not None else random.randint
+        batch_size = max(cls.split_batch, max_words + 1)
+
+        batch = []
+        for word in words:
+            batch.append(word)
+            if len(batch) >= batch_size:
+                with metrics.timer('split_sentences'):
+                    sentences_list, start = cls._split_batch(batch, min_words, max_words, metrics, randint)
+                yield from sentences_list
+                batch = batch[start:]
+
+        with metrics.timer('split_sentences'):
+            sentences_list, _ = cls._split_batch(batch, min_words, max_words, metrics, randint)
+        yield from sentences_list
+
+    # Returns the sentences of a batch and the index of the first word of the
+    # next window. Every word is in several windows, so the words are filtered
+    # in one pass over the joined batch (spaces are allowed, word boundaries
+    # stay the same) and marks[i] counts the words with a dialectic mark
+    # before word i.
+    @classmethod
+    def _split_batch(
+        cls, words: list[str], min_words, max_words, metrics: Metrics, randint
+    ) -> tuple[list[str], int]:
+        sentences_list = []
+        if not words:
+            return sentences_list, 0
+
+        words = cls.disallowed_pattern.sub('', " ".join(words)).split(" ")
+        search = cls.dialectic_pattern.search
+        marks = list(itertools.accumulate(
+            (search(word) is not None for word in words), initial=0
+        ))
+
+        start, end = 0, len(words) - max_words
+        while start < end:
+            sentence_len = randint(min_words, max_words)
+            window_end = start + max_words
+
+            if marks[window_end] != marks[start]:
+                sentences_list.append(" ".join(words[start:window_end]))
+            # Only a window of a single empty word is an empty sentence
+            elif max_words == 1 and not words[start]:
+                metrics.increment('sentences_empty')
+            else:
+                metrics.increment('sentences_without_dialectic')
+
+            start += sentence_len
+
+        return sentences_list, start
+
+    @staticmethod
+    def _put(q: queue.Queue, item, stop: threading.Event):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
@@ -0,0 +1,21 @@
+# Resident and proportional set size of this process in bytes. PSS splits
+# shared pages (like a memory-mapped StressSnapshot) between the processes
+# that map them, it is only available on Linux. max_rss needs the Unix only
+# resource module.
+def memory_usage() -> dict[str, int]:
+    usage = {}
+    try:
+        import resource
+        usage['max_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        pass
+
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                name, value = line.split(':', 1)
+                if name in ('Rss', 'Pss'):
+                    usage[name.lower()] = int(value.split()[0]) * 1024
+    except OSError:
+        pass
+    return usage
@@ -0,0 +1,75 @@
+# Combines the outputs of sharded runs into one deduplicated output.
+#
+#   python -m text_generator.merge -o merged.jsonl shard0.jsonl shard1.jsonl
+#   python -m text_generator.merge -o merged/ --max-bytes 268435456 node0/ node1/
+#
+# Inputs are JSONL files (as written by JsonlSink), plain text files with one
+# sentence per line or directories of them. The output is a JSONL file, or
+# text shards when it is a directory.
+import os
+import json
+import argparse
+from typing import Iterator
+
+from .dedup import BaseDedupStore, FingerprintStore, BloomFilterStore
+from .sink import BaseSink, JsonlSink, TextShardSink
+
+
+def iter_records(path: str) -> Iterator[tuple[str, dict | None]]:
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith(('.jsonl', '.txt')):
+                yield from iter_records(os.path.join(path, name))
+        return
+
+    is_jsonl = path.endswith('.jsonl')
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            if is_jsonl:
+                record = json.loads(line)
+                yield record.pop('text'), record or None
+            else:
+                yield line, None
+
+
+def merge(paths: list[str], sink: BaseSink, dedup: BaseDedupStore=None) -> tuple[int, int]:
+    dedup = dedup if dedup is not None else FingerprintStore()
+
+    written, duplicates = 0, 0
+    for path in paths:
+        for sentence, metadata in iter_records(path):
+            if not dedup.add(sentence):
+                duplicates += 1
+                continue
+            sink.write(sentence, metadata)
+            written += 1
+    sink.flush()
+
+    return written, duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge and deduplicate outputs of sharded runs")
+    parser.add_argument('inputs', nargs='+')
+    parser.add_argument('-o', '--output', required=True, help="JSONL file or a directory for text shards")
+    parser.add_argument('--max-bytes', type=int, default=256 * 1024 ** 2, help="size of text shards")
+    parser.add_argument('--bloom', type=int, default=0, help="use a Bloom filter for this many sentences")
+    parser.add_argument('--error-rate', type=float, default=0.001)
+    args = parser.parse_args()
+
+    dedup = BloomFilterStore(args.bloom, args.error_rate) if args.bloom else FingerprintStore()
+    if args.output.endswith('.jsonl'):
+        sink = JsonlSink(args.output)
+    else:
+        sink = TextShardSink(args.output, max_bytes=args.max_bytes)
+
+    with sink:
+        written, duplicates = merge(args.inputs, sink, dedup)
+    print(f"{written} sentences written, {duplicates} duplicates dropped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+import json
+import time
+import bisect
+import threading
+from typing import Callable
+
+# Upper bounds of histogram buckets, the last bucket is +Inf
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+VALUE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': dict(zip([*map(str, self.buckets), '+Inf'], self.counts)),
+        }
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics: 'Metrics', name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.metrics.observe_time(self.name, time.perf_counter() - self.start)
+
+
+# Counters, stage timers and histograms, shared by all workers of a run.
+# `callback(kind, name, value)` is called on every record, kind is one of
+# 'counter', 'timer' or 'histogram'.
+class Metrics:
+    enabled = True
+
+    def __init__(self, callback: Callable[[str, str, float], None]=None, prefix: str='text_generator'):
+        self.callback = callback
+        self.prefix = prefix
+
+        self.counters: dict[str, float] = {}
+        self.timers: dict[str, Histogram] = {}
+        self.histograms: dict[str, Histogram] = {}
+        self.lock = threading.Lock()
+
+    def increment(self, name: str, value: float=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        if self.callback is not None:
+            self.callback('counter', name, value)
+
+    def timer(self, name: str) -> _Timer:
+        return _Timer(self, name)
+
+    def observe_time(self, name: str, seconds: float):
+        self._observe(self.timers, TIME_BUCKETS, name, seconds)
+        if self.callback is not None:
+            self.callback('timer', name, seconds)
+
+    def observe(self, name: str, value: float):
+        self._observe(self.histograms, VALUE_BUCKETS, name, value)
+        if self.callback is not None:
+            self.callback('histogram', name, value)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                'counters': dict(self.counters),
+                'timers': {name: h.to_dict() for name, h in self.timers.items()},
+                'histograms': {name: h.to_dict() for name, h in self.histograms.items()},
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot())
+
+    def to_prometheus(self) -> str:
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in snapshot['counters'].items():
+            metric = f"{self.prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+
+        for suffix, histograms in (('_seconds', snapshot['timers']), ('', snapshot['histograms'])):
+            for name, h in histograms.items():
+                metric = f"{self.prefix}_{name}{suffix}"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in h['buckets'].items():
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f"{metric}_sum {h['sum']}")
+                lines.append(f"{metric}_count {h['count']}")
+
+        return '\n'.join(lines) + '\n'
+
+    def _observe(self, histograms: dict[str, Histogram], buckets: tuple, name: str, value: float):
+        with self.lock:
+            if (h := histograms.get(name)) is None:
+                h = histograms[name] = Histogram(buckets)
+            h.observe(value)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+# Default when metrics are disabled, every call is a no-op
+class NullMetrics(Metrics):
+    enabled = False
+    _timer = _NullTimer()
+
+    def __init__(self):
+        super().__init__()
+
+    def increment(self, name: str, value: float=1):
+        pass
+
+    def timer(self, name: str) -> _NullTimer:
+        return self._timer
+
+    def observe_time(self, name: str, seconds: float):
+        pass
+
+    def observe(self, name: str, value: float):
+        pass
+
+
+NULL_METRICS = NullMetrics()
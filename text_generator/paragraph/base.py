@@ -5,3 +5,14 @@ class BaseParagraphProcessor(abc.ABC):
     @abc.abstractmethod
     def process(self, paragraph: str) -> str:
         pass
+
+    # Results are aligned with the paragraphs, a paragraph that failed is
+    # replaced with its exception
+    def process_many(self, paragraphs: list[str]) -> list[str | Exception]:
+        results = []
+        for paragraph in paragraphs:
+            try:
+                results.append(self.process(paragraph))
+            except Exception as e:
+                results.append(e)
+        return results
@@ -2,6 +2,7 @@
 # it is better than pointlessly trying different regex combinations for hours
 # in hopes of good result. This has structure and keeps my mind sane. 
 
+import re
 import abc
 
 from enum import Enum, auto
@@ -43,6 +44,8 @@ class TokenType(Enum):
 
 
 class Token:
+    __slots__ = ('type', 'position', 'literal')
+
     def __init__(self, _type, position, literal):
         self.type: TokenType = _type
         self.position: int = position
@@ -53,6 +56,29 @@ class Token:
 
 
 class Tokenizer:
+    # Symbols that always make a token of their own
+    token_types = {
+        "(": TokenType.OPEN_PARENT, "[": TokenType.OPEN_PARENT,
+        ")": TokenType.CLOSE_PARENT, "]": TokenType.CLOSE_PARENT,
+        "\"": TokenType.QUOTE, "'": TokenType.QUOTE,
+        "«": TokenType.OPEN_QUOTE,
+        "»": TokenType.CLOSE_QUOTE,
+        ".": TokenType.ENDING_PUNCTUATION, "!": TokenType.ENDING_PUNCTUATION, "?": TokenType.ENDING_PUNCTUATION,
+        ",": TokenType.PUNCTUATION, ";": TokenType.PUNCTUATION, ":": TokenType.PUNCTUATION,
+        "/": TokenType.PUNCTUATION, "-": TokenType.PUNCTUATION,
+    }
+
+    # A word starts with any other symbol except a separator and goes on until
+    # punctuation (hyphens excluded) or a separator. Separators match nothing
+    # and are skipped by finditer.
+    pattern = re.compile(
+        "[{single}]|[^{single}{separators}][^{ending}{separators}]*".format(
+            single=re.escape(''.join(token_types)),
+            ending=re.escape(Alphabet.punctuation.replace('-', '')),
+            separators=re.escape(Alphabet.separators),
+        )
+    )
+
     def __init__(self):
         self.position: int = 0
         self.paragraph: str = None
@@ -60,84 +86,26 @@ class Tokenizer:
     def _init(self, paragraph):
         self.position = 0
         self.paragraph = paragraph
-    
-    def peek(self):
-        return self.paragraph[self.position]
-    
-    def peek_next(self):
-        if (next_pos := self.position + 1) >= len(self.paragraph):
-            return ""
-        return self.paragraph[next_pos]
-
-    def advance(self):
-        self.position += 1
-
-    def isEOF(self):
-        return self.position >= len(self.paragraph)
 
     def tokenise(self, paragraph):
         self._init(paragraph)
 
-        tokens = []
-
-        while not self.isEOF():
-            char = self.peek()
-            token: Token = None
-
-            match char:
-                case "(" | "[": 
-                    token = Token(TokenType.OPEN_PARENT, self.position, char)
-                    self.advance()
-                case ")" | "]": 
-                    token = Token(TokenType.CLOSE_PARENT, self.position, char)
-                    self.advance()
-                case "\"" | "'":
-                    token = Token(TokenType.QUOTE, self.position, char)
-                    self.advance()
-                case "«":
-                    token = Token(TokenType.OPEN_QUOTE, self.position, char)
-                    self.advance()
-                case "»":
-                    token = Token(TokenType.CLOSE_QUOTE, self.position, char)
-                    self.advance()
-                case "." | "!" | "?":
-                    token = Token(TokenType.ENDING_PUNCTUATION, self.position, char)
-                    self.advance()
-                case "," | ";" | ":" | "/" | "-":
-                    token = Token(TokenType.PUNCTUATION, self.position, char)
-                    self.advance()
-                case " ":
-                    # token = Token(TokenType.SPACE, self.position, char)
-                    self.advance()
-                case _:
-                    if char == " ":
-                        self.advance()
-                        continue
-                
-                    word = char
-                    start = self.position
-
-                    # TODO: seems dumb, figure out a better way to -
-                    while (
-                        (symbol := self.peek_next()) not in Alphabet.punctuation 
-                        and symbol not in Alphabet.separators 
-                        or symbol == '-'
-                    ):
-                        word += symbol
-                        self.advance()
-                    
-                    token = Token(TokenType.WORD, start, word)
-                    self.advance()
-            
-            if token:
-                tokens.append(token)
+        token_types = self.token_types
+        tokens = [
+            Token(token_types.get(match.group(), TokenType.WORD), match.start(), match.group())
+            for match in self.pattern.finditer(paragraph)
+        ]
 
+        self.position = len(paragraph)
         tokens.append(Token(TokenType.EOF, self.position, None))
         return tokens
 
 
 # ===== Parsing entities ===== #
 class Filterable(abc.ABC):
+    # Nodes are created per paragraph in large numbers, none of them has a __dict__
+    __slots__ = ()
+
     @abc.abstractmethod    
     def filter(self, _filter: Callable[[Any], bool]):
         pass
@@ -148,6 +116,8 @@ class Filterable(abc.ABC):
 
 
 class Entity(Filterable):
+    __slots__ = ('literal',)
+
     def __init__(self, literal):
         self.literal: str = literal
 
@@ -165,15 +135,17 @@ class Entity(Filterable):
 
 
 class Punctuation(Entity):
-    pass
+    __slots__ = ()
 
 
 class Word(Entity):
-    pass
+    __slots__ = ()
 
 
 ContentElement: TypeAlias = Union["Sentence", "Punctuation", "SubText"]
 class Sentence(Filterable):
+    __slots__ = ('content', 'ending')
+
     def __init__(self, content, ending):
         self.content: list[ContentElement] = content
         self.ending: list[Punctuation] = ending
@@ -219,6 +191,8 @@ class Sentence(Filterable):
     
 
 class Text(Filterable):
+    __slots__ = ('sentences',)
+
     def __init__(self, sentences=None):
         self.sentences: list[Sentence] = sentences or []
 
@@ -240,6 +214,8 @@ class Text(Filterable):
 
 
 class SubText(Text):
+    __slots__ = ('before', 'after')
+
     def __init__(self, sentences=None, before="", after=""):
         super().__init__(sentences)
 
@@ -373,6 +349,21 @@ class Parser:
 
 # ===== Processor ===== #
 class DialecticParagraphProcessor(BaseParagraphProcessor):
+    # Filter and stringify the tree in one traversal instead of Text.filter + str
+    fused_rendering = True
+
+    disallowed_pattern = re.compile(
+        "[^{}]+".format(re.escape(''.join(sorted(Alphabet.allowed_symbols))))
+    )
+
+    # Replace symbols with a common alternatives
+    preprocess_table = str.maketrans({
+        '—': '-',
+        '–': '-',
+        '\xa0': ' ',
+    })
+    ending_punctuation = tuple(Alphabet.ending_punctuation)
+
     def __init__(self):
         self.tokenizer = Tokenizer()
         self.parser = Parser()
@@ -381,22 +372,67 @@ class DialecticParagraphProcessor(BaseParagraphProcessor):
         paragraph = self._preprocess(paragraph)
         tokens = self.tokenizer.tokenise(paragraph)
         text = self.parser.parse(tokens)
-        text.filter(lambda s: s in Alphabet.allowed_symbols)
 
+        if self.fused_rendering:
+            return " ".join(self._render_sentences(text.sentences))
+
+        text.filter(lambda s: s in Alphabet.allowed_symbols)
         return str(text)
+
+    # Same result as Text.filter followed by str(): empty elements are dropped
+    # together with the punctuation right before them, trailing punctuation and
+    # empty sentences are dropped.
+    @classmethod
+    def _render_sentences(cls, sentences: list[Sentence]) -> list[str]:
+        rendered = []
+        for sentence in sentences:
+            r = cls._render_sentence(sentence)
+            if r is not None:
+                rendered.append(r)
+        return rendered
+
+    @classmethod
+    def _render_sentence(cls, sentence: Sentence) -> str | None:
+        # Rendered elements as (is punctuation, needs a space before, string)
+        elements: list[tuple[bool, bool, str]] = []
+        after_punctuation = False
+
+        for c in sentence.content:
+            if isinstance(c, SubText):
+                sentences = cls._render_sentences(c.sentences)
+                r = c.before + " ".join(sentences) + c.after if sentences else None
+                element = (False, True, r)
+            else:
+                r = cls.disallowed_pattern.sub('', c.literal) or None
+                is_punctuation = isinstance(c, Punctuation)
+                element = (is_punctuation, not is_punctuation or r == '-', r)
+
+            if r is None:
+                if after_punctuation:
+                    elements.pop()
+            else:
+                elements.append(element)
+            after_punctuation = isinstance(c, Punctuation)
+
+        while elements and elements[-1][0]:
+            elements.pop()
+        if not elements:
+            return None
+
+        parts = [elements[0][2]]
+        for _, space, string in elements[1:]:
+            if space:
+                parts.append(' ')
+            parts.append(string)
+        parts.extend(e.literal for e in sentence.ending)
+        return ''.join(parts)
     
     def _preprocess(self, paragraph: str) -> str:
         paragraph = paragraph.strip()
-        if not paragraph.endswith(tuple(Alphabet.ending_punctuation)):
+        if not paragraph.endswith(self.ending_punctuation):
             paragraph += '.'
 
-        # Replace symbols with a common alternatives
-        translation = {
-            ord('—'): ord('-'),
-            ord('–'): ord('-'),
-            160: ord(' ')
-        }
-        paragraph = paragraph.translate(translation)
+        paragraph = paragraph.translate(self.preprocess_table)
     
         return paragraph
     
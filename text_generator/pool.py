@@ -0,0 +1,142 @@
+import os
+import time
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .accent import AccentCache
+from .formatter import TranscriptionFormatter
+from .memory import memory_usage
+
+
+# Formatter of the current worker process, built once by the pool initializer
+_worker_formatter: TranscriptionFormatter = None
+
+
+def _init_worker(stress_snapshot: str, accent_cache_size: int | None, accent_cache_path: str | None, stats):
+    global _worker_formatter
+    start = time.perf_counter()
+
+    accent_cache = None
+    if accent_cache_size is not None:
+        accent_cache = AccentCache(accent_cache_size, accent_cache_path)
+    _worker_formatter = TranscriptionFormatter(accent_cache=accent_cache, stress_snapshot=stress_snapshot)
+    # First call loads the Normalizer, the spaCy pipeline and the acute tables
+    _worker_formatter.format("Привет.")
+
+    stats.put({'pid': os.getpid(), 'startup': time.perf_counter() - start, **memory_usage()})
+
+
+def _format_worker(texts: list[str], options: dict, method: str) -> list[str | Exception]:
+    return getattr(_worker_formatter, method)(texts, **options)
+
+
+# Runs TranscriptionFormatter.format in a pool of processes, each of them with
+# its own Normalizer. A batch is split into one chunk per worker, formatted
+# with the batch methods of the formatter. Results come back in the order of
+# the inputs, a text that failed is replaced with its exception. When a
+# worker dies the pool is rebuilt and the batch is sent again, at most
+# `max_restarts` times in a row. With `accent_cache_size` every worker keeps
+# its own AccentCache of that size, loaded from `accent_cache_path` when the
+# file exists (workers never save it).
+class FormatterPool:
+    def __init__(
+        self, workers: int=None, max_restarts: int=3, start_method: str=None,
+        stress_snapshot: str=None, accent_cache_size: int=None, accent_cache_path: str=None
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_restarts = max_restarts
+        # Workers are started while the generator threads run. A forked child
+        # could inherit a lock held by one of them (the import lock or the
+        # accentor lock), so processes are not forked by default.
+        if start_method is None:
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self.context = multiprocessing.get_context(start_method)
+        self.stress_snapshot = stress_snapshot
+        self.accent_cache_size = accent_cache_size
+        self.accent_cache_path = accent_cache_path
+
+        # Startup time and memory reported by every started worker
+        self.stats_queue = self.context.Queue()
+        self.stats: dict[int, dict] = {}
+
+        self.executor: ProcessPoolExecutor = None
+        self.lock = threading.Lock()
+        self.restarts: int = 0
+
+    def __enter__(self):
+        self._get_executor()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def format(self, text: str, **options) -> str:
+        result = self.format_many([text], **options)[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def format_many(self, texts: list[str], **options) -> list[str | Exception]:
+        return self._map('format_many', texts, options)
+
+    # TranscriptionFormatter.format_paragraph of every paragraph, the rest of
+    # the formatting is done by TranscriptionFormatter.iter_formatted_words
+    def format_paragraphs(self, paragraphs: list[str], **options) -> list[str | Exception]:
+        return self._map('format_paragraphs', paragraphs, options)
+
+    def worker_stats(self) -> list[dict]:
+        while True:
+            try:
+                stats = self.stats_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.stats[stats['pid']] = stats
+        return list(self.stats.values())
+
+    def close(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(cancel_futures=True)
+                self.executor = None
+
+    def _map(self, method: str, texts: list[str], options: dict) -> list[str | Exception]:
+        size = -(-len(texts) // self.workers) or 1
+        chunks = [texts[i:i + size] for i in range(0, len(texts), size)]
+
+        restarts = 0
+        while True:
+            executor = self._get_executor()
+            try:
+                results = executor.map(
+                    _format_worker, chunks, [options] * len(chunks), [method] * len(chunks)
+                )
+                return [result for chunk in results for result in chunk]
+            except BrokenProcessPool:
+                if restarts >= self.max_restarts:
+                    raise
+                restarts += 1
+                self._restart(executor)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    self.workers, mp_context=self.context, initializer=_init_worker,
+                    initargs=(
+                        self.stress_snapshot, self.accent_cache_size, self.accent_cache_path,
+                        self.stats_queue
+                    )
+                )
+            return self.executor
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        with self.lock:
+            # Other threads may have already replaced the broken pool
+            if self.executor is not broken:
+                return
+            self.executor = None
+            self.restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
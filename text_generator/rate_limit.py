@@ -1,15 +1,51 @@
 import time
+import asyncio
+import threading
 
 
-class RateLimiter:
-    def __init__(self, wait_time: float):
+# Token bucket on a monotonic clock: a token is added every `wait_time` seconds
+# up to `burst` tokens, every request takes one. A request that finds the bucket
+# empty reserves the next token and sleeps until it arrives, so the lock is
+# never held while waiting and waiters are served in order.
+class TokenBucket:
+    def __init__(self, wait_time: float, burst: int=1):
         self.wait_time: float = wait_time
-        self.start_time: time.time = time.time() - self.wait_time
-    
+        self.burst: int = burst
+
+        self.tokens: float = burst
+        self.updated: float = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self.lock:
+            now = time.monotonic()
+            if self.wait_time > 0:
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) / self.wait_time)
+            else:
+                self.tokens = self.burst
+            self.updated = now
+
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens * self.wait_time
+
+
+class RateLimiter(TokenBucket):
     def __enter__(self):
-        while time.time() < self.start_time + self.wait_time:
-            continue
-        self.start_time = time.time()
-    
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
     def __exit__(self, *_):
         pass
+
+
+class AsyncRateLimiter(TokenBucket):
+    async def __aenter__(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def __aexit__(self, *_):
+        pass
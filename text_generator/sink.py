@@ -0,0 +1,164 @@
+import os
+import re
+import abc
+import json
+
+
+class BaseSink(abc.ABC):
+    def __init__(self, batch_size: int=1000):
+        self.batch_size = batch_size
+        self.batch: list[tuple[str, dict | None]] = []
+        self.written: int = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, sentence: str, metadata: dict=None):
+        self.batch.append((sentence, metadata))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            self._write_batch(self.batch)
+            self.written += len(self.batch)
+            self.batch = []
+
+    def close(self):
+        self.flush()
+
+    @abc.abstractmethod
+    def _write_batch(self, batch: list[tuple[str, dict | None]]):
+        pass
+
+
+# One JSON object per line: {"text": ..., <metadata>}
+class JsonlSink(BaseSink):
+    def __init__(self, path: str, batch_size: int=1000):
+        super().__init__(batch_size)
+        self.path = path
+
+    def _write_batch(self, batch):
+        lines = []
+        for sentence, metadata in batch:
+            record = {'text': sentence, **metadata} if metadata else {'text': sentence}
+            lines.append(json.dumps(record, ensure_ascii=False))
+            lines.append('\n')
+
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(lines))
+
+
+# Plain text, one sentence per line, split into <prefix>-00000.txt,
+# <prefix>-00001.txt, ... of at most `max_bytes`. Numbering continues after
+# the shards that are already in the directory. Metadata is not written.
+class TextShardSink(BaseSink):
+    def __init__(
+        self, path: str, prefix: str='shard', max_bytes: int=256 * 1024 ** 2,
+        batch_size: int=1000
+    ):
+        super().__init__(batch_size)
+        self.path = path
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+
+        os.makedirs(self.path, exist_ok=True)
+        self.index = self._last_index(self.path, self.prefix, 'txt')
+        self.size = self._size(self.index)
+
+    def _write_batch(self, batch):
+        data = bytearray()
+        for sentence, _ in batch:
+            line = (sentence + '\n').encode('utf-8')
+            if self.size + len(data) + len(line) > self.max_bytes and (self.size or data):
+                self._append(data)
+                self.index += 1
+                self.size = 0
+                data = bytearray()
+            data += line
+        self._append(data)
+
+    def shard_path(self, index: int) -> str:
+        return os.path.join(self.path, f"{self.prefix}-{index:05d}.txt")
+
+    def _append(self, data: bytes):
+        if not data:
+            return
+        with open(self.shard_path(self.index), 'ab') as f:
+            f.write(data)
+        self.size += len(data)
+
+    def _size(self, index: int) -> int:
+        path = self.shard_path(index)
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    @staticmethod
+    def _last_index(path: str, prefix: str, extension: str) -> int:
+        pattern = re.compile(rf'{re.escape(prefix)}-(\d+)\.{extension}$')
+        indices = [int(m.group(1)) for name in os.listdir(path) if (m := pattern.match(name))]
+        return max(indices, default=0)
+
+
+# Parquet files <prefix>-00000.parquet, ... of at most `rows_per_file` rows, one
+# row group per batch. Needs pyarrow (the `parquet` extra). Metadata keys
+# become columns and are expected to be the same for every sentence.
+class ParquetSink(BaseSink):
+    def __init__(
+        self, path: str, prefix: str='shard', rows_per_file: int=1_000_000,
+        batch_size: int=10_000
+    ):
+        super().__init__(batch_size)
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("ParquetSink requires pyarrow, install text_generator[parquet]")
+        self.pyarrow = pyarrow
+
+        self.path = path
+        self.prefix = prefix
+        self.rows_per_file = rows_per_file
+
+        os.makedirs(self.path, exist_ok=True)
+        # Finished files are not reopened, a new run starts the next one
+        self.index = TextShardSink._last_index(self.path, self.prefix, 'parquet')
+        if os.path.exists(self.shard_path(self.index)):
+            self.index += 1
+
+        self.writer = None
+        self.rows: int = 0
+
+    def close(self):
+        super().close()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def shard_path(self, index: int) -> str:
+        return os.path.join(self.path, f"{self.prefix}-{index:05d}.parquet")
+
+    def _write_batch(self, batch):
+        while batch:
+            if self.writer is not None and self.rows >= self.rows_per_file:
+                self.writer.close()
+                self.writer = None
+                self.index += 1
+                self.rows = 0
+
+            part = batch[:self.rows_per_file - self.rows]
+            batch = batch[len(part):]
+
+            table = self._table(part)
+            if self.writer is None:
+                self.writer = self.pyarrow.parquet.ParquetWriter(self.shard_path(self.index), table.schema)
+            self.writer.write_table(table)
+            self.rows += len(part)
+
+    def _table(self, batch):
+        columns = {'text': [sentence for sentence, _ in batch]}
+        for key in (batch[0][1] or {}):
+            columns[key] = [(metadata or {}).get(key) for _, metadata in batch]
+        return self.pyarrow.table(columns)
@@ -0,0 +1,186 @@
+import os
+import mmap
+import struct
+import pickle
+import functools
+import importlib.util
+from collections.abc import Mapping
+from typing import Any, Iterator
+
+
+# Read-only, memory-mapped copy of the tsnorm stress dictionary. Opening it
+# takes milliseconds instead of unpickling the whole dictionary, and every
+# process that maps the same file shares its pages.
+#
+# Layout (little endian):
+#   header          magic, count and the offsets of the sections below
+#   key offsets     count + 1 uint64, into the keys section
+#   value offsets   count + 1 uint64, into the values section
+#   keys            UTF-8 words sorted by their bytes
+#   values          pickled list of interpretations of every word
+#   extra           pickled {'lemmas': ..., 'special_cases': [...]}
+class StressSnapshot(Mapping):
+    magic = b'TGSTRS01'
+    header = struct.Struct('<8sQQQQQQ')
+
+    def __init__(self, path: str, cache_size: int=65536):
+        self.path = path
+
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.count, index, keys, values, extra, end = self.header.unpack_from(self.mm)
+        if magic != self.magic:
+            raise ValueError(f"{path} is not a stress dictionary snapshot")
+
+        view = memoryview(self.mm)
+        self.key_offsets = view[index:index + 8 * (self.count + 1)].cast('Q')
+        self.value_offsets = view[index + 8 * (self.count + 1):keys].cast('Q')
+        self.keys_start = keys
+        self.values_start = values
+
+        extra = pickle.loads(self.mm[extra:end])
+        self.lemmas: dict[str, dict[str, Any]] = extra['lemmas']
+        self.special_cases: list[str] = extra['special_cases']
+
+        # Words added with Normalizer.update_dictionary
+        self.overrides: dict[str, list[dict[str, Any]]] = {}
+        self._value = functools.lru_cache(maxsize=cache_size)(self._load_value)
+
+    def __len__(self):
+        return self.count + len(self.overrides)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.overrides
+        for i in range(self.count):
+            yield self._key(i)
+
+    def __contains__(self, word) -> bool:
+        return word in self.overrides or self._find(word) is not None
+
+    def __getitem__(self, word: str) -> list[dict[str, Any]]:
+        if word in self.overrides:
+            return self.overrides[word]
+        if (i := self._find(word)) is None:
+            raise KeyError(word)
+        return self._value(i)
+
+    def update(self, word_forms: dict[str, list[dict[str, Any]]]):
+        self.overrides.update(word_forms)
+
+    def close(self):
+        self.key_offsets.release()
+        self.value_offsets.release()
+        self.mm.close()
+
+    @classmethod
+    def build(cls, path: str, word_forms: dict=None, lemmas: dict=None):
+        if word_forms is None or lemmas is None:
+            directory = cls._dictionary_path()
+            with open(os.path.join(directory, 'wordforms.dat'), 'rb') as f:
+                word_forms = pickle.load(f)
+            with open(os.path.join(directory, 'lemmas.dat'), 'rb') as f:
+                lemmas = pickle.load(f)
+
+        words = sorted((word.encode('utf-8'), word) for word in word_forms)
+        # Multi-word entries tsnorm registers as spaCy tokenizer exceptions
+        special_cases = [
+            word for word, forms in word_forms.items()
+            if (" " in word or "-" in word) and len(forms) == 1
+        ]
+
+        key_offsets, value_offsets = [0], [0]
+        values = []
+        for encoded, word in words:
+            key_offsets.append(key_offsets[-1] + len(encoded))
+            value = pickle.dumps(word_forms[word], protocol=pickle.HIGHEST_PROTOCOL)
+            value_offsets.append(value_offsets[-1] + len(value))
+            values.append(value)
+        extra = pickle.dumps(
+            {'lemmas': lemmas, 'special_cases': special_cases}, protocol=pickle.HIGHEST_PROTOCOL
+        )
+
+        count = len(words)
+        index = cls.header.size
+        keys = index + 16 * (count + 1)
+        values_start = keys + key_offsets[-1]
+        extra_start = values_start + value_offsets[-1]
+        end = extra_start + len(extra)
+
+        temp = f"{path}.tmp"
+        with open(temp, 'wb') as f:
+            f.write(cls.header.pack(cls.magic, count, index, keys, values_start, extra_start, end))
+            f.write(struct.pack(f'<{count + 1}Q', *key_offsets))
+            f.write(struct.pack(f'<{count + 1}Q', *value_offsets))
+            for encoded, _ in words:
+                f.write(encoded)
+            for value in values:
+                f.write(value)
+            f.write(extra)
+        os.replace(temp, path)
+
+    @staticmethod
+    def _dictionary_path() -> str:
+        # Located without importing tsnorm, its __init__ loads the spaCy model
+        spec = importlib.util.find_spec('tsnorm')
+        if spec is None or not spec.submodule_search_locations:
+            raise ImportError("tsnorm is not installed")
+        return os.path.join(spec.submodule_search_locations[0], 'dictionary')
+
+    def _key(self, i: int) -> str:
+        start = self.keys_start
+        return self.mm[start + self.key_offsets[i]:start + self.key_offsets[i + 1]].decode('utf-8')
+
+    def _find(self, word) -> int | None:
+        if not isinstance(word, str):
+            return None
+        target = word.encode('utf-8')
+
+        mm, offsets, start = self.mm, self.key_offsets, self.keys_start
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            key = mm[start + offsets[middle]:start + offsets[middle + 1]]
+            if key < target:
+                low = middle + 1
+            elif key > target:
+                high = middle
+            else:
+                return middle
+        return None
+
+    def _load_value(self, i: int) -> list[dict[str, Any]]:
+        start = self.values_start
+        return pickle.loads(self.mm[start + self.value_offsets[i]:start + self.value_offsets[i + 1]])
+
+
+# Same as tsnorm.Normalizer(**options), with the dictionary read from a snapshot
+def create_normalizer(
+    snapshot: 'StressSnapshot | str', stress_mark: str, stress_mark_pos: str,
+    stress_monosyllabic: bool=False, stress_yo: bool=False, min_word_len: int=1
+):
+    import spacy
+    from tsnorm import Normalizer
+    from tsnorm.spacy_model import MODEL
+
+    if stress_mark_pos not in ["before", "after"]:
+        raise ValueError("stress_mark_pos must be one of ['before', 'after']")
+    if isinstance(snapshot, str):
+        snapshot = StressSnapshot(snapshot)
+
+    normalizer = Normalizer.__new__(Normalizer)
+    normalizer.stress_mark = stress_mark
+    normalizer.stress_mark_pos = stress_mark_pos
+    normalizer.stress_monosyllabic = stress_monosyllabic
+    normalizer.stress_yo = stress_yo
+    normalizer.min_word_len = min_word_len
+
+    normalizer._word_forms = snapshot
+    normalizer._lemmas = snapshot.lemmas
+
+    normalizer._model = spacy.load(MODEL)
+    for word in snapshot.special_cases:
+        normalizer._model.tokenizer.add_special_case(word, [{"ORTH": word}])
+        normalizer._model.tokenizer.add_special_case(word.capitalize(), [{"ORTH": word.capitalize()}])
+
+    return normalizer
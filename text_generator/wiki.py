@@ -1,123 +1,398 @@
-import re
-import dataclasses
-import unicodedata
+import time
+import asyncio
+import weakref
+import functools
+import threading
+import collections
+from typing import TYPE_CHECKING, Callable
+from urllib.parse import quote
 
-import requests
-from bs4 import BeautifulSoup, Tag
+from .fetcher import BaseFetcher, Page, Section
+from .metrics import Metrics, NULL_METRICS
+from .rate_limit import RateLimiter, AsyncRateLimiter
 
-from .rate_limit import RateLimiter
+if TYPE_CHECKING:
+    import requests
+    from bs4 import Tag
+    from .cache import PageCache
 
 
-@dataclasses.dataclass
-class Section:
-    title: str
-    level: int
+class TitleBuffer:
+    def __init__(self, shard_index: int=0, shard_count: int=1):
+        self.titles: collections.deque[str] = collections.deque()
+        self.queued: set[str] = set()
+        self.fetched: set[str] = set()
+        self.lock = threading.Lock()
 
-    paragraphs: list[str] = dataclasses.field(default_factory=list)
-    subsections: list['Section'] = dataclasses.field(default_factory=list)
+        # Titles of other shards are dropped
+        self.shard_index = shard_index
+        self.shard_count = shard_count
 
-    def get_nested_paragraphs(self):
-        paragraphs = self.paragraphs.copy()
+    def __len__(self):
+        return len(self.titles)
 
-        for subsection in self.subsections:
-            paragraphs.extend(subsection.get_nested_paragraphs())
-        return paragraphs
+    def extend(self, titles: list[str]):
+        with self.lock:
+            for title in titles:
+                if title in self.queued or title in self.fetched:
+                    continue
+                if self.shard_count > 1 and BaseFetcher.title_shard(title, self.shard_count) != self.shard_index:
+                    continue
+                self.queued.add(title)
+                self.titles.append(title)
 
+    def pop(self) -> str | None:
+        with self.lock:
+            if not self.titles:
+                return None
+            title = self.titles.popleft()
+            self.queued.discard(title)
+            return title
 
-@dataclasses.dataclass
-class Page:
-    title: str = ""
-    section: Section = Section('Main', 1)
-    # sections: list[Section] = dataclasses.field(default_factory=list)
+    def mark_fetched(self, title: str):
+        with self.lock:
+            self.fetched.add(title)
 
-    def get_all_paragraphs(self):
-        return self.section.get_nested_paragraphs()
 
+class WikipediaFetcher(BaseFetcher):
+    api_url = 'https://ru.wikipedia.org/w/api.php'
+    title_url = '{api_url}?origin=*&action=query&format=json&list=random&rnlimit={limit}&rnnamespace=0&rnminsize=20000'
+    article_url = '{api_url}?origin=*&action=parse&format=json&page={title}&prop=text&disableeditsection=1'
 
-class WikipediaFetcher:
-    title_url = 'https://ru.wikipedia.org/w/api.php?origin=*&action=query&format=json&list=random&rnlimit=1&rnnamespace=0&rnminsize=20000'
-    article_url = 'https://ru.wikipedia.org/w/api.php?origin=*&action=parse&format=json&page={title}&prop=text'
+    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/111.0.0.0 Safari/537.36'}
 
-    def __init__(self, request_wait: float=1):
+    max_title_batch = 500
+
+    # Single pass HTML extraction, BeautifulSoup is used if it fails
+    fast_parsing = True
+
+    def __init__(
+        self, request_wait: float=1, api_url: str=None,
+        title_batch: int=max_title_batch, title_refill: int=50, request_burst: int=1,
+        cache: 'PageCache'=None, shard_index: int=0, shard_count: int=1,
+        metrics: Metrics=None
+    ):
         self.request_wait_time = request_wait
-        self.rate_limiter = RateLimiter(self.request_wait_time)
+        self.rate_limiter = RateLimiter(self.request_wait_time, request_burst)
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+
+        if api_url is not None:
+            self.api_url = api_url
+
+        # Random titles are requested in batches and handed out one by one,
+        # the buffer is refilled in the background when it runs low
+        self.title_batch = min(title_batch, self.max_title_batch)
+        self.title_refill = title_refill
+        self.titles = TitleBuffer(shard_index, shard_count)
+        self._refill_lock = threading.Lock()
+
+        self.cache = cache
+
+        # requests.Session is not thread-safe, every thread gets its own
+        # keep-alive session. Sessions of finished threads are dropped with
+        # their thread.
+        self._local = threading.local()
+        self._sessions: weakref.WeakSet['requests.Session'] = weakref.WeakSet()
+        self._sessions_lock = threading.Lock()
 
     def get_article(self, title) -> Page:
-        request = self._send_request(self.article_url.format(title=title))
+        if (page := self._get_cached(title)) is not None:
+            return page
+
+        request = self._send_request(self._article_url(title))
         result = request.json()
         html = result['parse']['text']['*']
 
-        page = self._parse_page(html)
+        with self.metrics.timer('parse_html'):
+            page = self._parse_page(html)
         page.title = title
+        page.revision = result['parse'].get('revid', 0)
+        self._put_cached(page)
         return page
     
     def get_random_article(self) -> Page:
+        return self.draw_random_article()()
+
+    def draw_random_article(self) -> Callable[[], Page]:
+        if self.cache is not None and self.cache.offline:
+            page = self.cache.get_random()
+            self.titles.mark_fetched(page.title)
+            return lambda: page
+
         title = self._get_random_title()
-        return self.get_article(title)
+        return functools.partial(self.get_article, title)
     
-    def get_random_text(self) -> str:
-        return ' '.join(self.get_random_article().get_all_paragraphs())
+    def skip_titles(self, titles):
+        for title in titles:
+            self.titles.mark_fetched(title)
+
+    def keep_shard(self, shard_index: int, shard_count: int):
+        self.titles.shard_index = shard_index
+        self.titles.shard_count = shard_count
+
+    def close(self):
+        with self._sessions_lock:
+            sessions = list(self._sessions)
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
     
+    def _get_cached(self, title: str) -> Page | None:
+        if self.cache is None:
+            return None
+
+        page = self.cache.get(title)
+        if page is None and self.cache.offline:
+            raise LookupError(f"Page {title} is not cached")
+        if page is not None:
+            self.titles.mark_fetched(title)
+            self.metrics.increment('cache_hits')
+        return page
+
+    def _put_cached(self, page: Page):
+        self.titles.mark_fetched(page.title)
+        if self.cache is not None:
+            self.cache.put(page)
+
     def _get_random_title(self) -> str:        
-        request = self._send_request(self.title_url)
-        result = request.json()
-        title = result['query']['random'][0]['title']
+        while (title := self.titles.pop()) is None:
+            # Waits for a background refill if there is one in progress
+            with self._refill_lock:
+                if not len(self.titles):
+                    self._refill_titles()
+
+        if len(self.titles) < self.title_refill and not self._refill_lock.locked():
+            threading.Thread(target=self._background_refill, daemon=True).start()
 
         return title
 
-    def _parse_page(self, html) -> Page:
-        bs = BeautifulSoup(html, 'html.parser')
+    def _background_refill(self):
+        if not self._refill_lock.acquire(blocking=False):
+            return
+        try:
+            if len(self.titles) < self.title_refill:
+                self._refill_titles()
+        except Exception as e:
+            print(f"Exception: {e}")
+        finally:
+            self._refill_lock.release()
 
-        main_tag: Tag = bs.find()
-        content: list[Tag] = main_tag.find_all(
-            lambda t: t.name == 'p' or t.name == 'dd' or (t.name == 'div' and 'class' in t.attrs and 'heading' in t['class']) 
-        )
+    def _refill_titles(self):
+        request = self._send_request(self._title_url())
+        result = request.json()
+        self.titles.extend(r['title'] for r in result['query']['random'])
+
+    def _title_url(self) -> str:
+        return self.title_url.format(api_url=self.api_url, limit=self.title_batch)
+
+    def _article_url(self, title: str) -> str:
+        return self.article_url.format(api_url=self.api_url, title=quote(title))
+
+    @classmethod
+    def _parse_page(cls, html) -> Page:
+        if cls.fast_parsing:
+            from .extract import ContentExtractor
+            try:
+                content = ContentExtractor().extract(html)
+            except Exception:
+                content = cls._extract_content(html)
+        else:
+            content = cls._extract_content(html)
         
         page = Page()
 
         # Get sections
         sections = [page.section]
-        for tag in content:
-            if tag.name == 'p' or tag.name == 'dd':
-                paragraph = tag.get_text()
-                paragraph = self._process_paragraph(paragraph)
+        for is_heading, text, classes, heading_tag in content:
+            if not is_heading:
+                paragraph = cls._process_paragraph(text)
                 sections[-1].paragraphs.append(paragraph)
             else:
-                heading_level = int(str(filter(lambda s: s.isdigit(), tag.attrs)))
-                sections.append(Section(tag.get_text(), heading_level))
-        sections = list(filter(self._filter_section, sections[1:]))
+                heading_level = cls._heading_level(classes, heading_tag)
+                sections.append(Section(text, heading_level))
+        cls._build_tree(page, sections[1:])
         
-        # Create tree structure
-        stack = [page.section]
-        for section in sections:
-            level = section.level
+        return page
 
-            while stack[-1].level >= level:
-                stack.pop()
+    @staticmethod
+    def _extract_content(html) -> list[tuple[bool, str, list[str], str | None]]:
+        from bs4 import BeautifulSoup
+        from .extract import ContentExtractor
 
-            parent = stack[-1]
-            parent.subsections.append(section)          
-            stack.append(section)
-        
-        return page
+        bs = BeautifulSoup(html, 'html.parser')
+
+        main_tag: 'Tag' = bs.find()
+        content: list['Tag'] = main_tag.find_all(
+            lambda t: t.name == 'p' or t.name == 'dd' or (
+                t.name == 'div' and 'class' in t.attrs and not ContentExtractor.heading_classes.isdisjoint(t['class'])
+            )
+        )
+
+        result = []
+        for tag in content:
+            if tag.name == 'p' or tag.name == 'dd':
+                result.append((False, tag.get_text(), None, None))
+            else:
+                heading_tag = tag.find(ContentExtractor.heading_tags)
+                heading_tag = heading_tag.name if heading_tag is not None else None
+                result.append((True, tag.get_text(), tag['class'], heading_tag))
+        return result
+
+    @staticmethod
+    def _heading_level(classes: list[str], heading_tag: str | None) -> int:
+        # <div class="mw-heading mw-heading3"><h3>...</h3></div> is a level 3 heading
+        if heading_tag is not None:
+            return int(heading_tag[1])
+        for c in classes:
+            if digits := ''.join(filter(lambda s: s.isdigit(), c)):
+                return int(digits)
+        return 2
 
     def _send_request(self, url: str):
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/111.0.0.0 Safari/537.36'}
+        start = time.perf_counter()
         with self.rate_limiter:
-            r = requests.post(url, headers=headers)
-        
+            waited = time.perf_counter() - start
+            with self.metrics.timer('request'):
+                r = self._session().post(url)
+        self.metrics.observe_time('rate_limit_wait', waited)
+
+        r.raise_for_status()
         return r
 
-    @staticmethod
-    def _process_paragraph(paragraph) -> str:
-        # Uncompress unicode characters
-        paragraph = unicodedata.normalize('NFD', paragraph)
+    def _session(self) -> 'requests.Session':
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+            session = requests.Session()
+            session.headers.update(self.headers)
+            self._local.session = session
+            with self._sessions_lock:
+                self._sessions.add(session)
+        return session
 
-        # Remove sources (vile!)
-        paragraph = re.sub('\[\d+\]', '', paragraph)
 
-        return paragraph
+# All requests go through one aiohttp session with a keep-alive connection pool
+# and share one rate limiter, so any number of tasks can use the same fetcher
+class AsyncWikipediaFetcher:
+    api_url = WikipediaFetcher.api_url
+    headers = WikipediaFetcher.headers
 
-    @staticmethod
-    def _filter_section(section: Section) -> bool:
-        return section.title != 'Примечания'
+    def __init__(
+        self, request_wait: float=1, api_url: str=None, connections: int=8,
+        title_batch: int=WikipediaFetcher.max_title_batch, title_refill: int=50, request_burst: int=1,
+        cache: 'PageCache'=None, shard_index: int=0, shard_count: int=1,
+        metrics: Metrics=None
+    ):
+        self.request_wait_time = request_wait
+        self.rate_limiter = AsyncRateLimiter(self.request_wait_time, request_burst)
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+
+        if api_url is not None:
+            self.api_url = api_url
+
+        self.title_batch = min(title_batch, WikipediaFetcher.max_title_batch)
+        self.title_refill = title_refill
+        self.titles = TitleBuffer(shard_index, shard_count)
+        self._refill_lock = asyncio.Lock()
+        self._refill_task = None
+
+        self.cache = cache
+
+        self.connections = connections
+        self.session = None
+
+    async def get_article(self, title) -> Page:
+        if (page := self._get_cached(title)) is not None:
+            return page
+
+        result = await self._send_request(self._article_url(title))
+        html = result['parse']['text']['*']
+
+        # Parse in a thread to keep the event loop free
+        loop = asyncio.get_running_loop()
+        page = await loop.run_in_executor(None, WikipediaFetcher._parse_page, html)
+        page.title = title
+        page.revision = result['parse'].get('revid', 0)
+        self._put_cached(page)
+        return page
+
+    async def get_random_article(self) -> Page:
+        if self.cache is not None and self.cache.offline:
+            page = self.cache.get_random()
+            self.titles.mark_fetched(page.title)
+            return page
+
+        title = await self._get_random_title()
+        return await self.get_article(title)
+
+    async def get_random_text(self) -> str:
+        page = await self.get_random_article()
+        return ' '.join(page.get_all_paragraphs())
+
+    async def close(self):
+        if self._refill_task is not None:
+            self._refill_task.cancel()
+            self._refill_task = None
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    skip_titles = WikipediaFetcher.skip_titles
+    keep_shard = WikipediaFetcher.keep_shard
+    _get_cached = WikipediaFetcher._get_cached
+    _put_cached = WikipediaFetcher._put_cached
+
+    async def _get_random_title(self) -> str:
+        while (title := self.titles.pop()) is None:
+            async with self._refill_lock:
+                if not len(self.titles):
+                    await self._refill_titles()
+
+        if (
+            len(self.titles) < self.title_refill and not self._refill_lock.locked()
+            and (self._refill_task is None or self._refill_task.done())
+        ):
+            self._refill_task = asyncio.create_task(self._background_refill())
+
+        return title
+
+    async def _background_refill(self):
+        async with self._refill_lock:
+            if len(self.titles) >= self.title_refill:
+                return
+            try:
+                await self._refill_titles()
+            except Exception as e:
+                print(f"Exception: {e}")
+
+    async def _refill_titles(self):
+        result = await self._send_request(self._title_url())
+        self.titles.extend(r['title'] for r in result['query']['random'])
+
+    def _title_url(self) -> str:
+        return WikipediaFetcher.title_url.format(api_url=self.api_url, limit=self.title_batch)
+
+    def _article_url(self, title: str) -> str:
+        return WikipediaFetcher.article_url.format(api_url=self.api_url, title=quote(title))
+
+    async def _send_request(self, url: str) -> dict:
+        if self.session is None:
+            import aiohttp
+            self.session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=self.connections)
+            )
+
+        start = time.perf_counter()
+        async with self.rate_limiter:
+            self.metrics.observe_time('rate_limit_wait', time.perf_counter() - start)
+            with self.metrics.timer('request'):
+                async with self.session.post(url) as r:
+                    r.raise_for_status()
+                    return await r.json(content_type=None)